@@ -1,11 +1,8 @@
 from __future__ import annotations
 
-import PIL.Image
-import PIL.ImageDraw
-import PIL.ImageFont
-
 from .blocks import Block, Boolean, C, Literal, Menu, Reporter, Stack
 from .context import Context
+from .render import render_to_image
 from .style import BlockStyle
 
 
@@ -47,11 +44,6 @@ for line in theme.split("\n"):
 
 
 def main() -> None:
-    background = (211, 211, 211)
-    padding = 10
-    image = PIL.Image.new("RGB", (800, 600), background)
-    ctx = Context(PIL.ImageDraw.Draw(image))
-    ctx.draw.font = PIL.ImageFont.load("fonts/cherry-10-r.pil")
     stack = Stack(
         [
             Block(
@@ -120,7 +112,6 @@ def main() -> None:
         ["if", Boolean(styles["operators"], [Literal("A"), "=", Literal("a")]), "then"],
         stack,
     )
-    c.render(ctx, padding, padding)
-    bounding_box = c.bounding_box(ctx).outset(padding)
-    image = image.crop(bounding_box.to_bbox(0, 0))
+    ctx = Context.load("fonts/cherry-10-r.pil")
+    image = render_to_image(c, ctx, padding=10, background=(211, 211, 211))
     image.save("output.png")
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+from array import array
+from enum import IntEnum
+from typing import TYPE_CHECKING
+
+from msgspec import Struct, field, structs
+
+from .blocks import Block, Boolean, C, Literal, Menu, Reporter, Stack
+from .render import render_to_image
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    import PIL.Image
+
+    from .blocks import BoxItem, Node
+    from .context import Context
+    from .layout import Layout
+    from .misc import Color
+    from .render import Script
+    from .style import BlockStyle
+
+
+class Kind(IntEnum):
+    LABEL = 0
+    LITERAL = 1
+    MENU = 2
+    REPORTER = 3
+    BOOLEAN = 4
+    BLOCK = 5
+    C = 6
+    STACK = 7
+
+
+KINDS = {
+    str: Kind.LABEL,
+    Literal: Kind.LITERAL,
+    Menu: Kind.MENU,
+    Reporter: Kind.REPORTER,
+    Boolean: Kind.BOOLEAN,
+    Block: Kind.BLOCK,
+    C: Kind.C,
+    Stack: Kind.STACK,
+}
+
+
+def children(node: Node) -> Iterable[Node]:
+    if isinstance(node, Block | Reporter | Boolean):
+        return node.items
+    if isinstance(node, C):
+        return [*node.items, node.stack]
+    if isinstance(node, Stack):
+        return node.items
+    return ()
+
+
+class Arena(Struct):
+    """Scripts flattened into parallel typed arrays, one slot per node.
+
+    A node is its `kinds` entry, the indices of its `parents`, `first_children`
+    and `next_siblings` (`-1` for none), an index into `styles` and one into the
+    string table, and whether it `is_last`. Labels and the values of `Literal`
+    and `Menu` are interned into one UTF-8 buffer with offsets, and equal
+    `BlockStyle`s are stored once, so a corpus costs a few dozen bytes per node
+    rather than a Python object per node and per list of items.
+
+    `add` flattens a script and `script` rebuilds it exactly; `layout` and
+    `render` rebuild only the script they are given, so the rest of the corpus
+    stays flat.
+    """
+
+    kinds: array[int] = field(default_factory=lambda: array("B"))
+    parents: array[int] = field(default_factory=lambda: array("i"))
+    first_children: array[int] = field(default_factory=lambda: array("i"))
+    next_siblings: array[int] = field(default_factory=lambda: array("i"))
+    style_indices: array[int] = field(default_factory=lambda: array("h"))
+    text_indices: array[int] = field(default_factory=lambda: array("i"))
+    is_last: array[int] = field(default_factory=lambda: array("B"))
+    roots: array[int] = field(default_factory=lambda: array("i"))
+    names: array[int] = field(default_factory=lambda: array("i"))
+    text: bytearray = field(default_factory=bytearray)
+    offsets: array[int] = field(default_factory=lambda: array("Q", [0]))
+    strings: dict[str, int] = field(default_factory=dict)
+    styles: list[BlockStyle] = field(default_factory=list)
+    style_keys: dict[tuple[Color, ...], int] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.roots)
+
+    def nbytes(self) -> int:
+        """Size of the arrays and the string buffer, without the interning
+        dictionaries."""
+        arrays = (
+            self.kinds,
+            self.parents,
+            self.first_children,
+            self.next_siblings,
+            self.style_indices,
+            self.text_indices,
+            self.is_last,
+            self.roots,
+            self.names,
+            self.offsets,
+        )
+        return sum(a.itemsize * len(a) for a in arrays) + len(self.text)
+
+    def intern(self, text: str) -> int:
+        index = self.strings.get(text)
+        if index is None:
+            index = self.strings[text] = len(self.offsets) - 1
+            self.text += text.encode()
+            self.offsets.append(len(self.text))
+        return index
+
+    def string(self, index: int) -> str:
+        return self.text[self.offsets[index] : self.offsets[index + 1]].decode()
+
+    def style(self, style: BlockStyle) -> int:
+        key = structs.astuple(style)
+        index = self.style_keys.get(key)
+        if index is None:
+            index = self.style_keys[key] = len(self.styles)
+            self.styles.append(style)
+        return index
+
+    def append(self, node: Node, parent: int) -> int:
+        index = len(self.kinds)
+        self.kinds.append(KINDS[type(node)])
+        self.parents.append(parent)
+        self.first_children.append(-1)
+        self.next_siblings.append(-1)
+        if isinstance(node, str):
+            self.text_indices.append(self.intern(node))
+        elif isinstance(node, Literal | Menu):
+            self.text_indices.append(self.intern(node.value))
+        else:
+            self.text_indices.append(-1)
+        self.style_indices.append(
+            -1
+            if isinstance(node, str | Literal | Menu | Stack)
+            else self.style(node.style)
+        )
+        self.is_last.append(isinstance(node, Block | C) and node.is_last)
+        return index
+
+    def add(self, script: Script, name: str = "") -> int:
+        """Flatten `script` into the arena; returns its number."""
+        root = self.append(script, -1)
+        pending: list[tuple[int, Node]] = [(root, script)]
+        while pending:
+            index, node = pending.pop()
+            previous = -1
+            for child in children(node):
+                child_index = self.append(child, index)
+                if previous < 0:
+                    self.first_children[index] = child_index
+                else:
+                    self.next_siblings[previous] = child_index
+                previous = child_index
+                pending.append((child_index, child))
+        self.roots.append(root)
+        self.names.append(self.intern(name))
+        return len(self.roots) - 1
+
+    @classmethod
+    def from_scripts(cls, scripts: Iterable[tuple[str, Script]]) -> Arena:
+        """Flatten `(name, script)` pairs such as those of `sb3.load`."""
+        arena = cls()
+        for name, script in scripts:
+            arena.add(script, name)
+        return arena
+
+    def node_children(self, index: int) -> Iterator[int]:
+        child = self.first_children[index]
+        while child >= 0:
+            yield child
+            child = self.next_siblings[child]
+
+    def node(self, index: int) -> Node:
+        """Rebuild the node at `index` and everything under it."""
+        kind = self.kinds[index]
+        if kind == Kind.LABEL:
+            return self.string(self.text_indices[index])
+        if kind in {Kind.LITERAL, Kind.MENU}:
+            leaf = Literal if kind == Kind.LITERAL else Menu
+            return leaf(self.string(self.text_indices[index]))
+        nodes = [self.node(child) for child in self.node_children(index)]
+        if kind == Kind.STACK:
+            return Stack([node for node in nodes if isinstance(node, Block | C)])
+        style = self.styles[self.style_indices[index]]
+        items: list[BoxItem] = [
+            node
+            for node in nodes
+            if isinstance(node, str | Literal | Menu | Reporter | Boolean)
+        ]
+        if kind in {Kind.REPORTER, Kind.BOOLEAN}:
+            return (Reporter if kind == Kind.REPORTER else Boolean)(style, items)
+        is_last = bool(self.is_last[index])
+        stack = nodes[-1] if kind == Kind.C else None
+        if not isinstance(stack, Stack):
+            return Block(style, items, is_last=is_last)
+        return C(style, items, stack, is_last=is_last)
+
+    def script(self, number: int) -> Script:
+        node = self.node(self.roots[number])
+        if isinstance(node, str | Literal | Menu):
+            msg = f"script {number} is a {type(node).__name__}, not a block"
+            raise TypeError(msg)
+        return node
+
+    def name(self, number: int) -> str:
+        return self.string(self.names[number])
+
+    def __iter__(self) -> Iterator[tuple[str, Script]]:
+        for number in range(len(self.roots)):
+            yield self.name(number), self.script(number)
+
+    def layout(self, number: int, ctx: Context, x: int = 0, y: int = 0) -> Layout:
+        return self.script(number).layout(ctx, x, y)
+
+    def render(
+        self,
+        number: int,
+        ctx: Context,
+        padding: int = 0,
+        background: Color = None,
+    ) -> PIL.Image.Image:
+        return render_to_image(self.script(number), ctx, padding, background)
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import io
+import itertools
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import TYPE_CHECKING
+
+import msgspec
+import PIL.Image
+from msgspec import Struct, field
+
+from .blocks import Block, Boolean, C, Reporter, Stack
+from .cache import DiskCache
+from .context import Context
+from .render import Output, render_to_bytes, render_to_image
+from .style import Style
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from .palette import Palette
+    from .render import Script
+
+
+class Options(Struct, frozen=True):
+    """What each worker renders with: the `.pil` font, the style and `output`,
+    a `DiskCache` directory and a shared palette. With `raw`, results are the
+    pixels rather than images encoded as `output.format`."""
+
+    font: str
+    style: Style = field(default_factory=Style)
+    output: Output = field(default_factory=Output)
+    raw: bool = False
+    cache: str | None = None
+    palette: Palette | None = None
+
+
+class Schedule(Struct, frozen=True):
+    """How a batch is spread over the pool: `chunk_size` scripts are sent at a
+    time, and at most `max_pending` chunks (default: two per worker) are in
+    flight or waiting to be consumed, which bounds memory."""
+
+    workers: int | None = None
+    chunk_size: int = 16
+    max_pending: int | None = None
+    ordered: bool = True
+
+
+class Rendered(Struct):
+    """One rendered script: `data` is the encoded image, or the raw pixels in
+    `mode` when no format was requested."""
+
+    index: int
+    data: bytes
+    size: tuple[int, int]
+    mode: str
+
+
+class Worker(Struct):
+    options: Options
+    ctx: Context
+    decoder: msgspec.msgpack.Decoder[list[Block | C | Stack | Reporter | Boolean]]
+
+
+worker: list[Worker] = []
+
+
+def initialize(options: Options) -> None:
+    """Load the font once per worker process; styles come with `scratchimg`."""
+    ctx = Context.load(options.font, options.style)
+    ctx.palette = options.palette
+    if options.cache is not None:
+        ctx.disk = DiskCache(options.cache)
+    worker.append(
+        Worker(
+            options,
+            ctx,
+            msgspec.msgpack.Decoder(list[Block | C | Stack | Reporter | Boolean]),
+        )
+    )
+
+
+def render_chunk(start: int, chunk: bytes) -> list[Rendered]:
+    state = worker[0]
+    options = state.options
+    results: list[Rendered] = []
+    output = options.output
+    for index, script in enumerate(state.decoder.decode(chunk), start):
+        if options.raw:
+            image = render_to_image(
+                script, state.ctx, output.padding, output.background
+            )
+            results.append(Rendered(index, image.tobytes(), image.size, image.mode))
+            continue
+        data = render_to_bytes(script, state.ctx, output)
+        with PIL.Image.open(io.BytesIO(data)) as image:
+            results.append(Rendered(index, data, image.size, image.mode))
+    return results
+
+
+def render_many(
+    scripts: Iterable[Script], options: Options, schedule: Schedule | None = None
+) -> Iterator[Rendered]:
+    """Render `scripts` with `options` on a pool of worker processes.
+
+    Scripts are sent to the workers msgpack-encoded, in chunks as `schedule`
+    says. Results are yielded in input order, or as they complete when it is
+    not `ordered`; `Rendered.index` is the position of the script in `scripts`.
+    With a `cache` directory, encoded images are shared through a `DiskCache`
+    there. With a `palette`, every script is drawn into a "P" image of that one
+    palette.
+    """
+    schedule = Schedule() if schedule is None else schedule
+    workers = schedule.workers or os.cpu_count() or 1
+    limit = schedule.max_pending or 2 * workers
+    chunk_size = schedule.chunk_size
+    encoder = msgspec.msgpack.Encoder()
+    with ProcessPoolExecutor(
+        workers, initializer=initialize, initargs=(options,)
+    ) as pool:
+        chunks = enumerate(itertools.batched(scripts, chunk_size))
+        pending: deque[Future[list[Rendered]]] = deque()
+        for number, chunk in chunks:
+            pending.append(
+                pool.submit(render_chunk, number * chunk_size, encoder.encode(chunk))
+            )
+            while len(pending) >= limit:
+                yield from drain(pending, schedule.ordered)
+        while pending:
+            yield from drain(pending, schedule.ordered)
+
+
+def drain(pending: deque[Future[list[Rendered]]], ordered: bool) -> Iterator[Rendered]:
+    """Wait for one chunk, the oldest if `ordered`, and yield its results."""
+    if ordered:
+        future = pending.popleft()
+    else:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        future = done.pop()
+        pending.remove(future)
+    yield from future.result()
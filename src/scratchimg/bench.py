@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import msgspec
+from msgspec import Struct, structs
+
+from . import styles
+from .arena import children
+from .blocks import Block, Boolean, C, Literal, Menu, Reporter, Stack
+from .cache import LeafCache
+from .context import Context
+from .render import Output, encode, new_image, paint_into
+from .skin import Skins
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+
+    from .blocks import BoxItem, Node
+    from .render import Script
+
+CATEGORIES = [category for category in styles if category != "operators"]
+WORDS = ["move", "steps", "say", "for", "seconds", "turn", "degrees", "set", "to"]
+PHASES = ("layout", "raster", "encode")
+
+
+def block_items(rng: random.Random, inputs: int) -> list[BoxItem]:
+    items: list[BoxItem] = [rng.choice(WORDS)]
+    for _ in range(inputs):
+        if rng.getrandbits(1):
+            items.append(Literal(str(rng.randrange(1000))))
+        else:
+            items.append(Menu(rng.choice(WORDS)))
+        items.append(rng.choice(WORDS))
+    return items
+
+
+def flat(rng: random.Random, size: int) -> Script:
+    """A `Stack` of `size` simple blocks."""
+    return Stack(
+        [
+            Block(styles[rng.choice(CATEGORIES)], block_items(rng, rng.randrange(3)))
+            for _ in range(size)
+        ]
+    )
+
+
+def nested(rng: random.Random, size: int) -> Script:
+    """`size` C blocks, each holding a block and the next C block."""
+    script: Block | C = Block(styles["motion"], block_items(rng, 1))
+    for _ in range(size):
+        inner = Block(styles[rng.choice(CATEGORIES)], block_items(rng, 1))
+        script = C(styles["control"], ["repeat", Literal("10")], Stack([inner, script]))
+    return Stack([script])
+
+
+def wide(rng: random.Random, size: int) -> Script:
+    """A block with `size` literal and menu inputs."""
+    return Stack([Block(styles[rng.choice(CATEGORIES)], block_items(rng, size))])
+
+
+def expression(rng: random.Random, depth: int) -> Reporter | Boolean:
+    if depth == 0:
+        return Reporter(styles["variables"], [rng.choice(WORDS)])
+    style = styles["operators"]
+    if rng.getrandbits(1):
+        return Reporter(
+            style,
+            [
+                expression(rng, depth - 1),
+                rng.choice("+-*/"),
+                expression(rng, depth - 1),
+            ],
+        )
+    return Boolean(
+        style,
+        [
+            expression(rng, depth - 1),
+            rng.choice(["and", "or"]),
+            expression(rng, depth - 1),
+        ],
+    )
+
+
+def expressions(rng: random.Random, size: int) -> Script:
+    """A block holding a balanced tree of operators `size` levels deep."""
+    return Stack([Block(styles["looks"], ["say", expression(rng, size)])])
+
+
+GENERATORS: dict[str, tuple[Callable[[random.Random, int], Script], int]] = {
+    "flat": (flat, 1000),
+    "nested": (nested, 60),
+    "wide": (wide, 400),
+    "expressions": (expressions, 9),
+}
+
+
+def count(node: Node) -> int:
+    return 1 + sum(count(child) for child in children(node))
+
+
+class Phase(Struct):
+    seconds: float
+    ns_per_node: float
+
+
+class Result(Struct):
+    nodes: int
+    phases: dict[str, Phase]
+    peak_bytes: int
+
+
+def run(script: Script, ctx: Context, padding: int) -> dict[str, float]:
+    """Seconds spent laying out, painting and PNG-encoding `script` once, with
+    empty leaf and skin caches."""
+    ctx = structs.replace(ctx, leaves=LeafCache(), skins=Skins())
+    start = time.perf_counter()
+    layout = script.layout(ctx, padding, padding)
+    laid_out = time.perf_counter()
+    size = layout.bounding_box.outset(padding)
+    image = new_image((size.w, size.h))
+    paint_into(script, layout, ctx, image)
+    painted = time.perf_counter()
+    encode(image, Output())
+    encoded = time.perf_counter()
+    return {
+        "layout": laid_out - start,
+        "raster": painted - laid_out,
+        "encode": encoded - painted,
+    }
+
+
+def measure(script: Script, ctx: Context, repeat: int = 5, padding: int = 10) -> Result:
+    """The best of `repeat` runs of each phase, and the peak of Python memory
+    allocated during one more run. Image buffers are allocated by Pillow and
+    are not counted."""
+    nodes = count(script)
+    runs = [run(script, ctx, padding) for _ in range(repeat)]
+    tracemalloc.start()
+    try:
+        run(script, ctx, padding)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    phases: dict[str, Phase] = {}
+    for phase in PHASES:
+        seconds = min(times[phase] for times in runs)
+        phases[phase] = Phase(seconds, seconds * 1e9 / nodes)
+    return Result(nodes, phases, peak)
+
+
+def compare(
+    results: dict[str, Result], baseline: dict[str, Result], tolerance: float
+) -> list[str]:
+    """A line for each phase more than `tolerance` slower per node than in
+    `baseline`."""
+    regressions: list[str] = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for phase, timing in result.phases.items():
+            before = baseline[name].phases.get(phase)
+            if before is not None and timing.ns_per_node > before.ns_per_node * (
+                1 + tolerance
+            ):
+                regressions.append(
+                    f"{name} {phase}: {timing.ns_per_node:.0f} ns/node,"
+                    f" baseline {before.ns_per_node:.0f}"
+                )
+    return regressions
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m scratchimg.bench",
+        description="Time layout, rasterization and encoding of generated scripts.",
+    )
+    parser.add_argument(
+        "workloads", nargs="*", help=f"any of {', '.join(GENERATORS)}, all if not given"
+    )
+    parser.add_argument("--font", type=Path, default=Path("fonts/cherry-10-r.pil"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--scale", type=float, default=1, help="multiplies the size of each workload"
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        help="JSON results saved on this machine to fail against if slower",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed slowdown over --baseline, as a fraction",
+    )
+    parser.add_argument("--save", type=Path, help="write the results as JSON here")
+    args = parser.parse_args(argv)
+    for name in args.workloads:
+        if name not in GENERATORS:
+            parser.error(f"unknown workload {name!r}")
+    ctx = Context.load(args.font)
+    results: dict[str, Result] = {}
+    for name in args.workloads or GENERATORS:
+        generate, size = GENERATORS[name]
+        rng = random.Random(args.seed)  # noqa: S311 - reproducible workloads
+        script = generate(rng, max(1, round(size * args.scale)))
+        results[name] = measure(script, ctx, args.repeat)
+    data = msgspec.json.format(msgspec.json.encode(results))
+    sys.stdout.write(data.decode() + "\n")
+    if args.save is not None:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_bytes(data + b"\n")
+    if args.baseline is None:
+        return 0
+    baseline = msgspec.json.decode(args.baseline.read_bytes(), type=dict[str, Result])
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        sys.stderr.write(f"regression: {line}\n")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,69 +1,157 @@
 from __future__ import annotations
 
+import bisect
+import time
 from typing import TYPE_CHECKING, Sequence
 
 from msgspec import Struct
 
 from .bounding_box import BoundingBox
+from .layout import Layout
+from .style import BlockStyle  # noqa: TC001 - msgspec decodes fields at runtime
 
 if TYPE_CHECKING:
     from .context import Context
-    from .style import BlockStyle
 
 type Color = str | tuple[int, int, int] | None
 
 
-class Literal(Struct):
+def measure(ctx: Context, item: Node, sizes: Sizes) -> BoundingBox:
+    """Bounding box of `item`, memoized in `sizes` for the duration of one layout.
+
+    Entries hold their node, labels included, so an `id` is only trusted for
+    that node and cannot be reused while its entry is kept.
+    """
+    entry = sizes.get(id(item))
+    if entry is None or entry[0] is not item:
+        box = (
+            ctx.text_bounding_box(item)
+            if isinstance(item, str)
+            else item.bounding_box(ctx, sizes)
+        )
+        entry = sizes[id(item)] = (item, box)
+    return entry[1]
+
+
+def place(
+    ctx: Context,
+    item: Literal | Menu | Reporter | Boolean | Block | C | Stack,
+    x: int,
+    y: int,
+    sizes: Sizes,
+) -> Layout:
+    """Layout of `item` at `x`, `y`, reused from `ctx.layouts` when it was last
+    laid out at the same position and has not been invalidated since. Layouts
+    hold their node, which is checked like the entries of `measure`."""
+    if ctx.stats is not None:
+        start = time.perf_counter_ns()
+        layout = reuse(ctx, item, x, y, sizes)
+        ctx.stats.subtree("layout", item, start)
+        return layout
+    return reuse(ctx, item, x, y, sizes)
+
+
+def reuse(
+    ctx: Context,
+    item: Literal | Menu | Reporter | Boolean | Block | C | Stack,
+    x: int,
+    y: int,
+    sizes: Sizes,
+) -> Layout:
+    if ctx.layouts is None:
+        return item.layout(ctx, x, y, sizes)
+    layout = ctx.layouts.get(id(item))
+    if layout is None or layout.node is not item or layout.x != x or layout.y != y:
+        layout = item.layout(ctx, x, y, sizes)
+        ctx.layouts[id(item)] = layout
+    return layout
+
+
+def paint(ctx: Context, item: Block | C, layout: Layout) -> None:
+    """Paint a block of a `Stack`, timing it when `ctx` has a stats collector."""
+    if ctx.stats is None:
+        item.paint(ctx, layout)
+        return
+    start = time.perf_counter_ns()
+    item.paint(ctx, layout)
+    ctx.stats.subtree("raster", item, start)
+
+
+class Literal(Struct, tag=True):
     value: str
 
     def render(self, ctx: Context, x: int, y: int, style: BlockStyle) -> None:
-        box = self.bounding_box(ctx)
+        self.paint(ctx, self.layout(ctx, x, y), style)
+
+    def paint(self, ctx: Context, layout: Layout, style: BlockStyle) -> None:
         render_rounded_rectangle(
             ctx,
-            box.to_bbox(x, y),
+            layout.to_bbox(),
             roundness=ctx.style.literal_roundness,
             fill=ctx.style.literal_background,
             outline=style.outline,
         )
-        ctx.draw.text(
-            (x + ctx.style.padding_x, y + ctx.style.padding_y),
+        ctx.text(
+            (layout.x + ctx.style.padding_x, layout.y + ctx.style.padding_y),
             self.value,
             fill=ctx.style.literal_foreground,
         )
 
-    # Don't care about memory leaks, this is not a long-running program
-    # @lru_cache
-    def bounding_box(self, ctx: Context) -> BoundingBox:
+    def bounding_box(self, ctx: Context, _sizes: Sizes | None = None) -> BoundingBox:
         box = ctx.text_bounding_box(self.value)
         return box.outsetx(ctx.style.padding_x).outsety(ctx.style.padding_y)
 
+    def layout(
+        self,
+        ctx: Context,
+        x: int = 0,
+        y: int = 0,
+        sizes: Sizes | None = None,
+    ) -> Layout:
+        box = measure(ctx, self, {} if sizes is None else sizes)
+        inner = box.outsetx(-ctx.style.padding_x).outsety(-ctx.style.padding_y)
+        return Layout(self, x, y, box.w, box.h, inner)
+
 
-class Menu(Struct):
+class Menu(Struct, tag=True):
     value: str
 
     def render(self, ctx: Context, x: int, y: int, style: BlockStyle) -> None:
-        box = self.bounding_box(ctx)
+        self.paint(ctx, self.layout(ctx, x, y), style)
+
+    def paint(self, ctx: Context, layout: Layout, style: BlockStyle) -> None:
         render_rounded_rectangle(
             ctx,
-            box.to_bbox(x, y),
+            layout.to_bbox(),
             roundness=ctx.style.literal_roundness,
             fill=style.menu_background,
             outline=style.outline,
         )
-        ctx.draw.text(
-            (x + ctx.style.padding_x, y + ctx.style.padding_y),
+        ctx.text(
+            (layout.x + ctx.style.padding_x, layout.y + ctx.style.padding_y),
             self.value,
             fill=style.foreground,
         )
 
-    # Don't care about memory leaks, this is not a long-running program
-    # @lru_cache
-    def bounding_box(self, ctx: Context) -> BoundingBox:
+    def bounding_box(self, ctx: Context, _sizes: Sizes | None = None) -> BoundingBox:
         box = ctx.text_bounding_box(self.value)
         return box.outsetx(ctx.style.padding_x).outsety(ctx.style.padding_y)
 
+    def layout(
+        self,
+        ctx: Context,
+        x: int = 0,
+        y: int = 0,
+        sizes: Sizes | None = None,
+    ) -> Layout:
+        box = measure(ctx, self, {} if sizes is None else sizes)
+        inner = box.outsetx(-ctx.style.padding_x).outsety(-ctx.style.padding_y)
+        return Layout(self, x, y, box.w, box.h, inner)
+
 
 type BoxItem = str | Literal | Menu | Reporter | Boolean
+type Node = BoxItem | Block | C | Stack
+type Sizes = dict[int, tuple[Node, BoundingBox]]
 
 
 class Box(Struct):
@@ -73,185 +161,297 @@ class Box(Struct):
     min_height: int = 0
 
     def render(self, ctx: Context, x: int, y: int) -> None:
-        box = self.bounding_box(ctx)
-        for item in self.items:
+        self.paint(ctx, self.layout(ctx, x, y))
+
+    def paint(self, ctx: Context, layouts: Sequence[Layout]) -> None:
+        for item, layout in zip(self.items, layouts, strict=True):
             if isinstance(item, str):
-                item_box = ctx.text_bounding_box(item)
-                dy = (box.h - item_box.h) // 2
-                ctx.draw.text((x, dy + y), item, fill=self.style.foreground)
+                ctx.text((layout.x, layout.y), item, fill=self.style.foreground)
+            elif ctx.leaves is not None:
+                ctx.leaves.paint(ctx, item, layout, self.style)
+            elif isinstance(item, Literal | Menu):
+                item.paint(ctx, layout, self.style)
             else:
-                item_box = item.bounding_box(ctx)
-                dy = (box.h - item_box.h) // 2
-                if isinstance(item, Literal | Menu):
-                    item.render(ctx, x, y + dy, self.style)
-                else:
-                    item.render(ctx, x, y + dy)
-            x += item_box.w + self.gap
+                item.paint(ctx, layout)
 
-    def bounding_box(self, ctx: Context) -> BoundingBox:
+    def bounding_box(self, ctx: Context, sizes: Sizes | None = None) -> BoundingBox:
+        sizes = {} if sizes is None else sizes
         box = BoundingBox(0, self.min_height)
         for item in self.items:
+            box = box.placex(measure(ctx, item, sizes))
+        return box.addx(self.gap * max(len(self.items) - 1, 0))
+
+    def layout(
+        self,
+        ctx: Context,
+        x: int,
+        y: int,
+        sizes: Sizes | None = None,
+        box: BoundingBox | None = None,
+    ) -> tuple[Layout, ...]:
+        """`box` is this row's bounding box, if the caller has measured it."""
+        sizes = {} if sizes is None else sizes
+        box = self.bounding_box(ctx, sizes) if box is None else box
+        layouts: list[Layout] = []
+        for item in self.items:
+            item_box = measure(ctx, item, sizes)
+            dy = (box.h - item_box.h) // 2
             if isinstance(item, str):
-                item_box = ctx.text_bounding_box(item)
+                layout = Layout(item, x, y + dy, item_box.w, item_box.h, item_box)
             else:
-                item_box = item.bounding_box(ctx)
-            box = box.placex(item_box)
-        return box.addx(ctx.style.gap * (len(self.items) - 1))
+                layout = place(ctx, item, x, y + dy, sizes)
+            layouts.append(layout)
+            x += item_box.w + self.gap
+        return tuple(layouts)
 
 
-class Block(Struct):
+class Block(Struct, tag=True):
     style: BlockStyle
     items: Sequence[BoxItem]
     is_last: bool = False
 
-    def render(self, ctx: Context, x: int, y: int) -> None:
-        box = Box(
+    def box(self, ctx: Context) -> Box:
+        return Box(
             self.items,
             self.style,
             gap=ctx.style.gap,
             min_height=ctx.style.min_block_height,
         )
-        render_block(
+
+    def render(self, ctx: Context, x: int, y: int) -> None:
+        self.paint(ctx, self.layout(ctx, x, y))
+
+    def paint(self, ctx: Context, layout: Layout) -> None:
+        (ctx.skins.block if ctx.skins is not None else render_block)(
             ctx,
-            box.bounding_box(ctx)
-            .outsetx(ctx.style.padding_x)
+            layout.inner.outsetx(ctx.style.padding_x)
             .outsety(ctx.style.padding_y)
-            .to_bbox(x, y),
+            .to_bbox(layout.x, layout.y),
             self.style,
             self.is_last,
         )
-        box.render(ctx, x + ctx.style.padding_x, y + ctx.style.padding_y)
+        self.box(ctx).paint(ctx, layout.children)
 
-    def bounding_box(self, ctx: Context) -> BoundingBox:
-        box = Box(
-            self.items,
-            self.style,
-            gap=ctx.style.gap,
-            min_height=ctx.style.min_block_height,
-        ).bounding_box(ctx)
+    def bounding_box(self, ctx: Context, sizes: Sizes | None = None) -> BoundingBox:
+        box = self.box(ctx).bounding_box(ctx, sizes)
         box = box.outsetx(ctx.style.padding_x).outsety(ctx.style.padding_y)
         if not self.is_last:
             box = box.addy(ctx.style.tab_height)
         return box
 
+    def layout(
+        self,
+        ctx: Context,
+        x: int = 0,
+        y: int = 0,
+        sizes: Sizes | None = None,
+    ) -> Layout:
+        sizes = {} if sizes is None else sizes
+        box = measure(ctx, self, sizes)
+        row = self.box(ctx)
+        inner = row.bounding_box(ctx, sizes)
+        x_inner = x + ctx.style.padding_x
+        y_inner = y + ctx.style.padding_y
+        return Layout(
+            self,
+            x,
+            y,
+            box.w,
+            box.h,
+            inner,
+            row.layout(ctx, x_inner, y_inner, sizes, inner),
+        )
 
-class Reporter(Struct):
+
+class Reporter(Struct, tag=True):
     style: BlockStyle
     items: Sequence[BoxItem]
 
+    def box(self, ctx: Context) -> Box:
+        return Box(self.items, self.style, gap=ctx.style.gap)
+
     def render(self, ctx: Context, x: int, y: int) -> None:
-        box = Box(self.items, self.style, gap=ctx.style.gap)
+        self.paint(ctx, self.layout(ctx, x, y))
+
+    def paint(self, ctx: Context, layout: Layout) -> None:
         render_rounded_rectangle(
             ctx,
-            box.bounding_box(ctx)
-            .outsetx(ctx.style.padding_x)
-            .outsety(ctx.style.padding_y)
-            .to_bbox(x, y),
+            layout.to_bbox(),
             roundness=ctx.style.reporter_roundness,
             fill=self.style.background,
             outline=self.style.outline,
             highlight=self.style.highlight,
             shadow=self.style.shadow,
         )
-        box.render(ctx, x + ctx.style.padding_x, y + ctx.style.padding_y)
+        self.box(ctx).paint(ctx, layout.children)
 
-    def bounding_box(self, ctx: Context) -> BoundingBox:
-        box = Box(self.items, self.style, gap=ctx.style.gap).bounding_box(ctx)
+    def bounding_box(self, ctx: Context, sizes: Sizes | None = None) -> BoundingBox:
+        box = self.box(ctx).bounding_box(ctx, sizes)
         return box.outsetx(ctx.style.padding_x).outsety(ctx.style.padding_y)
 
+    def layout(
+        self,
+        ctx: Context,
+        x: int = 0,
+        y: int = 0,
+        sizes: Sizes | None = None,
+    ) -> Layout:
+        sizes = {} if sizes is None else sizes
+        box = measure(ctx, self, sizes)
+        row = self.box(ctx)
+        inner = row.bounding_box(ctx, sizes)
+        x_inner = x + ctx.style.padding_x
+        y_inner = y + ctx.style.padding_y
+        return Layout(
+            self,
+            x,
+            y,
+            box.w,
+            box.h,
+            inner,
+            row.layout(ctx, x_inner, y_inner, sizes, inner),
+        )
 
-class Boolean(Struct):
+
+class Boolean(Struct, tag=True):
     style: BlockStyle
     items: Sequence[BoxItem]
 
+    def box(self, ctx: Context) -> Box:
+        return Box(self.items, self.style, gap=ctx.style.gap)
+
     def render(self, ctx: Context, x: int, y: int) -> None:
-        box = Box(
-            self.items,
-            self.style,
-            gap=ctx.style.gap,
-        )
-        bounding_box = box.bounding_box(ctx).outsety(ctx.style.padding_y)
-        padding_x = (bounding_box.h // 2) - ctx.style.boolean_roundness
+        self.paint(ctx, self.layout(ctx, x, y))
+
+    def paint(self, ctx: Context, layout: Layout) -> None:
         render_rounded_rectangle(
             ctx,
-            bounding_box.outsetx(padding_x).to_bbox(x, y),
-            roundness=padding_x,
+            layout.to_bbox(),
+            roundness=(layout.h // 2) - ctx.style.boolean_roundness,
             fill=self.style.background,
             outline=self.style.outline,
             highlight=self.style.highlight,
             shadow=self.style.shadow,
         )
-        box.render(ctx, x + padding_x, y + ctx.style.padding_y)
+        self.box(ctx).paint(ctx, layout.children)
 
-    def bounding_box(self, ctx: Context) -> BoundingBox:
-        box = Box(
-            self.items,
-            self.style,
-            gap=ctx.style.gap,
-        )
-        box = box.bounding_box(ctx).outsety(ctx.style.padding_y)
+    def bounding_box(self, ctx: Context, sizes: Sizes | None = None) -> BoundingBox:
+        box = self.box(ctx).bounding_box(ctx, sizes).outsety(ctx.style.padding_y)
         padding_x = (box.h // 2) - ctx.style.boolean_roundness
         return box.outsetx(padding_x)
 
+    def layout(
+        self,
+        ctx: Context,
+        x: int = 0,
+        y: int = 0,
+        sizes: Sizes | None = None,
+    ) -> Layout:
+        sizes = {} if sizes is None else sizes
+        box = measure(ctx, self, sizes)
+        row = self.box(ctx)
+        inner = row.bounding_box(ctx, sizes)
+        padding_x = (box.h // 2) - ctx.style.boolean_roundness
+        return Layout(
+            self,
+            x,
+            y,
+            box.w,
+            box.h,
+            inner,
+            row.layout(ctx, x + padding_x, y + ctx.style.padding_y, sizes, inner),
+        )
+
 
-class Stack(Struct):
+class Stack(Struct, tag=True):
     items: Sequence[Block | C]
 
     def is_last(self) -> bool:
         return len(self.items) > 0 and self.items[-1].is_last
 
     def render(self, ctx: Context, x: int, y: int) -> None:
-        for item in self.items:
-            item_box = item.bounding_box(ctx)
-            item.render(ctx, x, y)
-            y += item_box.h - ctx.style.tab_height - 1
-
-    def bounding_box(self, ctx: Context) -> BoundingBox:
+        self.paint(ctx, self.layout(ctx, x, y))
+
+    def paint(self, ctx: Context, layout: Layout) -> None:
+        if ctx.viewport is None:
+            for item, item_layout in zip(self.items, layout.children, strict=True):
+                paint(ctx, item, item_layout)
+            return
+        # Items are laid out top to bottom, and each overlaps the next only by
+        # its tab, so both their tops and bottoms increase.
+        _, y0, _, y1 = ctx.viewport
+        children = layout.children
+        start = bisect.bisect_right(children, y0, key=lambda child: child.y + child.h)
+        end = bisect.bisect_left(children, y1, start, key=lambda child: child.y)
+        for i in range(start, end):
+            if children[i].intersects(ctx.viewport):
+                paint(ctx, self.items[i], children[i])
+
+    def bounding_box(self, ctx: Context, sizes: Sizes | None = None) -> BoundingBox:
+        sizes = {} if sizes is None else sizes
         box = BoundingBox(0, 0)
         for item in self.items:
-            item_box = item.bounding_box(ctx).suby(ctx.style.tab_height + 1)
+            item_box = measure(ctx, item, sizes).suby(ctx.style.tab_height + 1)
             box = box.placey(item_box)
         if len(self.items) > 0 and not self.items[-1].is_last:
             box = box.addy(ctx.style.tab_height + 1)
         return box
 
+    def layout(
+        self,
+        ctx: Context,
+        x: int = 0,
+        y: int = 0,
+        sizes: Sizes | None = None,
+    ) -> Layout:
+        sizes = {} if sizes is None else sizes
+        box = measure(ctx, self, sizes)
+        layouts: list[Layout] = []
+        item_y = y
+        for item in self.items:
+            layout = place(ctx, item, x, item_y, sizes)
+            layouts.append(layout)
+            item_y += layout.h - ctx.style.tab_height - 1
+        return Layout(self, x, y, box.w, box.h, box, tuple(layouts))
+
 
-class C(Struct):
+class C(Struct, tag=True):
     style: BlockStyle
     items: Sequence[BoxItem]
     stack: Stack
     is_last: bool = False
 
+    def box(self, ctx: Context) -> Box:
+        return Box(self.items, self.style, ctx.style.gap, ctx.style.min_block_height)
+
     def render(self, ctx: Context, x: int, y: int) -> None:
-        box = Box(self.items, self.style, ctx.style.gap, ctx.style.min_block_height)
-        items_bounding_box = box.bounding_box(ctx)
-        stack_bounding_box = self.stack.bounding_box(ctx)
+        self.paint(ctx, self.layout(ctx, x, y))
+
+    def paint(self, ctx: Context, layout: Layout) -> None:
+        *items, stack = layout.children
         is_stack_last = self.stack.is_last()
-        height = max(stack_bounding_box.h, ctx.style.c_min_height)
+        height = max(stack.h, ctx.style.c_min_height)
         if not is_stack_last:
             height -= ctx.style.tab_height + 1
-        render_c(
+        (ctx.skins.c if ctx.skins is not None else render_c)(
             ctx,
             self.style,
-            x,
-            y,
-            x + ctx.style.padding_x * 2 + items_bounding_box.w - 1,
-            y + ctx.style.padding_y * 2 + items_bounding_box.h - 1,
+            layout.x,
+            layout.y,
+            layout.x + ctx.style.padding_x * 2 + layout.inner.w - 1,
+            layout.y + ctx.style.padding_y * 2 + layout.inner.h - 1,
             height,
             is_stack_last=is_stack_last,
             is_last=self.is_last,
         )
-        y += ctx.style.padding_y
-        box.render(ctx, x + ctx.style.padding_x, y)
-        x += ctx.style.c_width
-        y += items_bounding_box.h + ctx.style.padding_y - 1
-        self.stack.render(ctx, x, y)
-
-    def bounding_box(self, ctx: Context) -> BoundingBox:
-        box = Box(self.items, self.style, ctx.style.gap, ctx.style.min_block_height)
-        box = box.bounding_box(ctx)
+        self.box(ctx).paint(ctx, items)
+        self.stack.paint(ctx, stack)
+
+    def bounding_box(self, ctx: Context, sizes: Sizes | None = None) -> BoundingBox:
+        sizes = {} if sizes is None else sizes
+        box = self.box(ctx).bounding_box(ctx, sizes)
         stack_bounding_box = (
-            self.stack.bounding_box(ctx)
+            measure(ctx, self.stack, sizes)
             .addx(ctx.style.c_width)
             .placey(BoundingBox(0, ctx.style.c_min_height))
         )
@@ -264,6 +464,29 @@ class C(Struct):
             box = box.addy(ctx.style.tab_height)
         return box
 
+    def layout(
+        self,
+        ctx: Context,
+        x: int = 0,
+        y: int = 0,
+        sizes: Sizes | None = None,
+    ) -> Layout:
+        sizes = {} if sizes is None else sizes
+        box = measure(ctx, self, sizes)
+        row = self.box(ctx)
+        inner = row.bounding_box(ctx, sizes)
+        x_inner = x + ctx.style.padding_x
+        y_inner = y + ctx.style.padding_y
+        items = row.layout(ctx, x_inner, y_inner, sizes, inner)
+        stack = place(
+            ctx,
+            self.stack,
+            x + ctx.style.c_width,
+            y + ctx.style.padding_y * 2 + inner.h - 1,
+            sizes,
+        )
+        return Layout(self, x, y, box.w, box.h, inner, (*items, stack))
+
 
 def render_rounded_rectangle(
     ctx: Context,
@@ -276,7 +499,7 @@ def render_rounded_rectangle(
 ) -> None:
     x0, y0, x1, y1 = box
 
-    ctx.draw.polygon(
+    ctx.polygon(
         (
             (x0 + roundness, y0),
             (x1 - roundness, y0),
@@ -362,7 +585,7 @@ def render_block(
         ]
     )
 
-    ctx.draw.polygon(verts, fill=style.background, outline=style.outline)
+    ctx.polygon(verts, fill=style.background, outline=style.outline)
 
     if style.highlight:
         # fmt: off
@@ -489,7 +712,7 @@ def render_c(
         (x0, y0 + roundness),
     ]
 
-    ctx.draw.polygon(verts, fill=style.background, outline=style.outline)
+    ctx.polygon(verts, fill=style.background, outline=style.outline)
 
     if style.highlight:
         verts = [
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import msgspec
+import PIL.Image
+import PIL.ImageDraw
+from msgspec import Struct, field, structs
+
+from .blocks import Boolean, Literal, Menu, Reporter
+
+if TYPE_CHECKING:
+    from collections.abc import Hashable
+
+    from .blocks import BoxItem
+    from .context import Context
+    from .layout import Layout
+    from .render import Output, Script
+    from .style import BlockStyle
+
+type Leaf = Literal | Menu | Reporter | Boolean
+
+
+def leaf_key(item: BoxItem) -> Hashable:
+    if isinstance(item, str):
+        return item
+    if isinstance(item, Literal | Menu):
+        return (type(item).__name__, item.value)
+    return (
+        type(item).__name__,
+        structs.astuple(item.style),
+        tuple(leaf_key(child) for child in item.items),
+    )
+
+
+class LeafCache(Struct):
+    """Bounded LRU cache of rendered `Literal`, `Menu`, `Reporter` and `Boolean`
+    widgets, stored as RGBA tiles.
+
+    Keyed by the widget's content, the `BlockStyle` it is drawn with, the `Style`
+    and the font, so a repeated widget is rasterized once and then pasted.
+    Only used by a `Context` that draws text through a `GlyphAtlas`.
+    """
+
+    max_entries: int = 1024
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    tiles: OrderedDict[Hashable, PIL.Image.Image] = field(default_factory=OrderedDict)
+
+    def paint(
+        self, ctx: Context, item: Leaf, layout: Layout, style: BlockStyle
+    ) -> None:
+        if ctx.atlas is None:
+            self.paint_uncached(ctx, item, layout, style)
+            return
+        key = (
+            leaf_key(item),
+            structs.astuple(style) if isinstance(item, Literal | Menu) else None,
+            structs.astuple(ctx.style),
+            ctx.atlas.metrics.path,
+        )
+        tile = self.tiles.get(key)
+        if tile is None:
+            self.misses += 1
+            if ctx.stats is not None:
+                ctx.stats.count("leaves.miss")
+            tile = self.rasterize(ctx, item, style)
+            if len(self.tiles) >= self.max_entries:
+                self.tiles.popitem(last=False)
+                self.evictions += 1
+            self.tiles[key] = tile
+        else:
+            self.hits += 1
+            if ctx.stats is not None:
+                ctx.stats.count("leaves.hit")
+            self.tiles.move_to_end(key)
+        ctx.paste(tile, (layout.x, layout.y), tile)
+
+    def paint_uncached(
+        self, ctx: Context, item: Leaf, layout: Layout, style: BlockStyle
+    ) -> None:
+        if isinstance(item, Literal | Menu):
+            item.paint(ctx, layout, style)
+        else:
+            item.paint(ctx, layout)
+
+    def rasterize(self, ctx: Context, item: Leaf, style: BlockStyle) -> PIL.Image.Image:
+        tile_ctx = structs.replace(
+            ctx, leaves=None, canvas=None, viewport=None, palette=None
+        )
+        layout = item.layout(tile_ctx)
+        tile = PIL.Image.new("RGBA", (layout.w, layout.h))
+        tile_ctx.draw = PIL.ImageDraw.Draw(tile)
+        self.paint_uncached(tile_ctx, item, layout, style)
+        return tile
+
+    def clear(self) -> None:
+        self.tiles.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self.tiles),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class DiskCache(Struct):
+    """Content-addressed store of encoded images in the directory `path`, which
+    any number of processes may share.
+
+    Entries are keyed by a hash of the msgpack-encoded script, which carries its
+    `BlockStyle`s, together with the `Style`, the font metrics and the output
+    options. Files are written under a temporary name and renamed into place,
+    so a reader never sees a partial file. A hit touches the file, and once the
+    directory grows past `max_bytes` the least recently used files are removed
+    until it is back under `low_water` of it.
+    """
+
+    path: str | Path
+    max_bytes: int = 256 * 2**20
+    low_water: float = 0.9
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    size: int | None = None
+
+    def key(self, script: Script, ctx: Context, output: Output) -> str:
+        data = msgspec.msgpack.encode(
+            (
+                script,
+                ctx.style,
+                ctx.metrics,
+                output.padding,
+                output.background,
+                output.format.lower(),
+            )
+            + (() if ctx.palette is None else (ctx.palette.colors,))
+            + (() if output.scale == 1 else (output.scale,))
+        )
+        return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+    def file(self, key: str) -> Path:
+        return Path(self.path) / key[:2] / key[2:]
+
+    def get(self, key: str) -> bytes | None:
+        file = self.file(key)
+        try:
+            data = file.read_bytes()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(file)
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        file = self.file(key)
+        file.parent.mkdir(parents=True, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=file.parent, prefix=".", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        Path(temporary).replace(file)
+        if self.size is None:
+            self.size = sum(size for _, size, _ in self.scan())
+        else:
+            self.size += len(data)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def scan(self) -> list[tuple[float, int, Path]]:
+        """`(mtime, size, file)` of every entry; other processes' temporary
+        files are skipped."""
+        entries: list[tuple[float, int, Path]] = []
+        root = Path(self.path)
+        if not root.is_dir():
+            return entries
+        for directory in root.iterdir():
+            if not directory.is_dir():
+                continue
+            for file in directory.iterdir():
+                if file.name.startswith("."):
+                    continue
+                with contextlib.suppress(FileNotFoundError):
+                    stat = file.stat()
+                    entries.append((stat.st_mtime, stat.st_size, file))
+        return entries
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until under `low_water` of
+        `max_bytes`, counting what other processes have written too."""
+        entries = sorted(self.scan(), key=lambda entry: entry[0])
+        size = sum(size for _, size, _ in entries)
+        for _, file_size, file in entries:
+            if size <= self.max_bytes * self.low_water:
+                break
+            file.unlink(missing_ok=True)
+            size -= file_size
+            self.evictions += 1
+        self.size = size
+
+    def clear(self) -> None:
+        for _, _, file in self.scan():
+            file.unlink(missing_ok=True)
+        self.size = 0
+
+    def stats(self) -> dict[str, int | float]:
+        entries = self.scan()
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import os
+import re
+import sys
+import time
+import zipfile
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import msgspec
+from msgspec import Struct, field
+
+from . import sb3, server
+from .batch import Options
+from .context import Context
+from .render import Output, render_to_image
+from .scale import upscale, write_png
+from .svg import write_svg
+from .syntax import parse_scripts
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence
+
+    from .render import Script
+
+SUFFIXES = {"txt", "scratchblocks", "sb3"}
+STATE = ".scratchimg.json"
+# What a bad input file can raise while it is read, decoded or rendered, with
+# UnicodeError, a ValueError, for undecodable files and text the font lacks.
+ERRORS = (
+    SyntaxError,
+    ValueError,
+    KeyError,
+    OSError,
+    zipfile.BadZipFile,
+    msgspec.MsgspecError,
+)
+
+
+class Source(Struct):
+    """A rendered input file: its `(mtime_ns, size)` and the hash of the script
+    behind each output it produced."""
+
+    stamp: tuple[int, int]
+    outputs: dict[str, str] = field(default_factory=dict)
+
+
+class State(Struct):
+    settings: str = ""
+    sources: dict[str, Source] = field(default_factory=dict)
+
+
+class Builder(Struct):
+    """Renders script files and `.sb3` projects under `paths` into `out`.
+
+    A file whose stamp is unchanged is not read again, and a script is only
+    rendered when the hash of its tree, together with the style, font and
+    output options, differs from the last build.
+    """
+
+    paths: list[Path]
+    out: Path
+    ctx: Context
+    font: Path
+    padding: int = 0
+    background: str | None = None
+    format: str = "png"
+    scales: list[int] = field(default_factory=lambda: [1])
+    state: State = field(default_factory=State)
+
+    def settings(self) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        for suffix in (".pil", ".png", ".gif", ".pbm"):
+            path = self.font.with_suffix(suffix)
+            if path.exists():
+                digest.update(path.read_bytes())
+        digest.update(
+            msgspec.msgpack.encode(
+                (self.ctx.style, self.padding, self.background, self.format)
+                + (() if self.scales == [1] else (self.scales,))
+            )
+        )
+        return digest.hexdigest()
+
+    def load_state(self) -> None:
+        path = self.out / STATE
+        try:
+            self.state = msgspec.json.decode(path.read_bytes(), type=State)
+        except (OSError, msgspec.DecodeError):
+            self.state = State()
+
+    def save_state(self) -> None:
+        path = self.out / STATE
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(msgspec.json.encode(self.state))
+
+    def sources(self) -> Iterator[tuple[str, Path, os.stat_result]]:
+        """Each input file with the output directory it renders into and its
+        `stat`. Walks with `os.scandir` rather than `pathlib`, which would
+        otherwise dominate the time of a build where nothing changed."""
+        for path in self.paths:
+            if path.is_dir():
+                yield from walk(str(path), self.out)
+            elif path.exists():
+                yield str(path), self.out, path.stat()
+
+    def scripts(self, source: Path, directory: Path) -> Iterator[tuple[Path, Script]]:
+        if source.suffix == ".sb3":
+            for key, script in sb3.load(source):
+                name = re.sub(r"[^\w.-]", "_", key.replace("/", "-"))
+                yield directory / source.stem / f"{name}.{self.format}", script
+            return
+        with source.open(encoding="utf-8") as lines:
+            scripts = list(parse_scripts(lines))
+        if len(scripts) == 1:
+            yield directory / f"{source.stem}.{self.format}", scripts[0]
+            return
+        for number, script in enumerate(scripts, 1):
+            yield directory / f"{source.stem}-{number}.{self.format}", script
+
+    def build(self) -> tuple[int, int]:
+        """Bring `out` up to date; returns the number of scripts rendered and
+        the number of files that failed. A failed file is reported with its
+        path and is not tried again until it changes."""
+        settings = self.settings()
+        if self.state.settings != settings:
+            self.state = State(settings)
+        rendered = 0
+        errors = 0
+        seen: set[str] = set()
+        changed = False
+        for key, directory, stat in self.sources():
+            seen.add(key)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            old = self.state.sources.get(key)
+            if old is not None and old.stamp == stamp:
+                continue
+            changed = True
+            try:
+                rendered += self.render(Path(key), directory, stamp, old)
+            except ERRORS as error:
+                errors += 1
+                sys.stderr.write(f"{key}: {type(error).__name__}: {error}\n")
+                self.state.sources[key] = Source(
+                    stamp, {} if old is None else old.outputs
+                )
+        for key in self.state.sources.keys() - seen:
+            changed = True
+            for output in self.state.sources.pop(key).outputs:
+                Path(output).unlink(missing_ok=True)
+        if changed:
+            self.save_state()
+        return rendered, errors
+
+    def render(
+        self, source: Path, directory: Path, stamp: tuple[int, int], old: Source | None
+    ) -> int:
+        previous = {} if old is None else old.outputs
+        current = Source(stamp)
+        rendered = 0
+        for output, script in self.scripts(source, directory):
+            digest = hashlib.blake2b(
+                msgspec.msgpack.encode(script),
+                digest_size=16,
+                key=self.state.settings.encode(),
+            ).hexdigest()
+            paths = [scaled(output, scale) for scale in self.scales]
+            for path in paths:
+                current.outputs[str(path)] = digest
+            if all(
+                previous.get(str(path)) == digest and path.exists() for path in paths
+            ):
+                continue
+            output.parent.mkdir(parents=True, exist_ok=True)
+            if self.format == "svg":
+                with output.open("w", encoding="utf-8") as file:
+                    write_svg(
+                        script, self.ctx, file, Output(self.padding, self.background)
+                    )
+            else:
+                image = render_to_image(script, self.ctx, self.padding, self.background)
+                for path, scale in zip(paths, self.scales, strict=True):
+                    if scale == 1:
+                        image.save(path)
+                    elif self.format == "png":
+                        with path.open("wb") as file:
+                            write_png(image, file, scale)
+                    else:
+                        upscale(image, scale).save(path)
+            rendered += 1
+        for output in previous.keys() - current.outputs.keys():
+            Path(output).unlink(missing_ok=True)
+        self.state.sources[str(source)] = current
+        return rendered
+
+
+def scaled(output: Path, scale: int) -> Path:
+    """Where the output at `output` goes `scale` times larger, as `name@2x.png`."""
+    if scale == 1:
+        return output
+    return output.with_name(f"{output.stem}@{scale}x{output.suffix}")
+
+
+def walk(directory: str, out: Path) -> Iterator[tuple[str, Path, os.stat_result]]:
+    with os.scandir(directory) as scan:
+        entries = sorted(scan, key=lambda entry: entry.name)
+    for entry in entries:
+        if entry.is_dir():
+            yield from walk(entry.path, out / entry.name)
+        elif entry.name.rpartition(".")[2] in SUFFIXES and entry.is_file():
+            yield entry.path, out, entry.stat()
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="scratchimg",
+        description="Render scratchblocks-style script files and .sb3 projects to images.",
+    )
+    parser.add_argument(
+        "paths", nargs="*", type=Path, help="script files, .sb3 projects or directories"
+    )
+    parser.add_argument(
+        "-o", "--out", type=Path, default=Path(), help="output directory"
+    )
+    parser.add_argument("--font", type=Path, default=Path("fonts/cherry-10-r.pil"))
+    parser.add_argument("--padding", type=int, default=0)
+    parser.add_argument(
+        "--background", help="background color, transparent if not given"
+    )
+    parser.add_argument(
+        "--format", default="png", help="output file extension, svg for vector output"
+    )
+    parser.add_argument(
+        "--scale",
+        type=int,
+        action="append",
+        metavar="N",
+        help="write each image N times larger, as name@Nx.png;"
+        " repeat for several sizes from one render",
+    )
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="re-render changed scripts until interrupted",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.2,
+        help="seconds between checks in --watch mode",
+    )
+    parser.add_argument(
+        "--serve",
+        type=int,
+        metavar="PORT",
+        help="serve POST /render and GET /metrics over HTTP instead",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="address for --serve")
+    parser.add_argument("--workers", type=int, help="render processes for --serve")
+    args = parser.parse_args(argv)
+    if args.serve is not None:
+        with contextlib.suppress(KeyboardInterrupt):
+            server.serve(
+                Options(str(args.font), output=Output(args.padding, args.background)),
+                args.host,
+                args.serve,
+                args.workers,
+            )
+        return 0
+    if not args.paths:
+        parser.error("no paths to render")
+    scales = args.scale or [1]
+    if min(scales) < 1:
+        parser.error("--scale must be a positive integer")
+    if args.format == "svg" and scales != [1]:
+        parser.error("--scale applies to raster formats, not svg")
+    builder = Builder(
+        args.paths,
+        args.out,
+        Context.load(args.font),
+        args.font,
+        args.padding,
+        args.background,
+        args.format,
+        scales,
+    )
+    builder.load_state()
+    try:
+        while True:
+            start = time.perf_counter()
+            rendered, errors = builder.build()
+            if rendered or errors or not args.watch:
+                elapsed = (time.perf_counter() - start) * 1000
+                sys.stderr.write(f"rendered {rendered} scripts in {elapsed:.0f} ms\n")
+            if not args.watch:
+                return 1 if errors else 0
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,28 +1,196 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Sequence
+from contextlib import AbstractContextManager, nullcontext
+from typing import TYPE_CHECKING, Protocol, Sequence
 
 from msgspec import Struct, field
 
 from .bounding_box import BoundingBox
+from .cache import DiskCache, LeafCache
+from .font import FontMetrics, GlyphAtlas
+from .skin import Skins
 from .style import Style
 
 if TYPE_CHECKING:
+    from pathlib import Path
+
+    from PIL.Image import Image
     from PIL.ImageDraw import ImageDraw
 
+    from .layout import Layout
     from .misc import Color
+    from .palette import Palette
+    from .raster import Canvas, Raster
+    from .stats import Stats
+
+
+class Recorder(Protocol):
+    """Takes the drawing of a `Context` instead of an image, see
+    `display.DisplayList` and `svg.SvgWriter`."""
+
+    def polygon(
+        self, verts: Sequence[tuple[int, int]], fill: Color, outline: Color
+    ) -> None: ...
+
+    def outline(self, color: Color, verts: Sequence[tuple[int, int]]) -> None: ...
+
+    def text(self, xy: tuple[int, int], text: str, fill: Color) -> None: ...
+
+    def fill(self, box: tuple[int, int, int, int], color: Color) -> None: ...
 
 
 class Context(Struct):
-    draw: ImageDraw
+    draw: ImageDraw | None = None
     style: Style = field(default_factory=Style)
+    metrics: FontMetrics | None = None
+    atlas: GlyphAtlas | None = None
+    leaves: LeafCache | None = None
+    skins: Skins | None = None
+    disk: DiskCache | None = None
+    backend: Raster | None = None
+    canvas: Canvas | None = None
+    recorder: Recorder | None = None
+    viewport: tuple[int, int, int, int] | None = None
+    layouts: dict[int, Layout] | None = None
+    stats: Stats | None = None
+    palette: Palette | None = None
+
+    @classmethod
+    def load(
+        cls,
+        font: str | Path,
+        style: Style | None = None,
+        backend: Raster | None = None,
+    ) -> Context:
+        """A context that measures and draws with the bitmap font at `font` and
+        caches leaf widgets and block skins, but has nothing to draw into yet.
+        `backend` replaces `ImageDraw` when rendering, see `raster.Raster`."""
+        atlas = GlyphAtlas.load(font)
+        return cls(
+            style=Style() if style is None else style,
+            metrics=atlas.metrics,
+            atlas=atlas,
+            leaves=LeafCache(),
+            skins=Skins(),
+            backend=backend,
+        )
+
+    def shift(self, verts: Sequence[tuple[int, int]]) -> Sequence[tuple[int, int]]:
+        """`verts` relative to the top-left corner of the viewport."""
+        if self.viewport is None:
+            return verts
+        x0, y0 = self.viewport[:2]
+        return [(x - x0, y - y0) for x, y in verts]
+
+    def shift_box(self, box: tuple[int, int, int, int]) -> tuple[int, int, int, int]:
+        if self.viewport is None:
+            return box
+        x0, y0 = self.viewport[:2]
+        return (box[0] - x0, box[1] - y0, box[2] - x0, box[3] - y0)
+
+    @property
+    def image_draw(self) -> ImageDraw:
+        if self.draw is None:
+            msg = "this Context has no ImageDraw to render into"
+            raise ValueError(msg)
+        return self.draw
+
+    @property
+    def image(self) -> Image:
+        return self.image_draw._image  # type: ignore
+
+    def phase(self, name: str) -> AbstractContextManager[object]:
+        """Times the body as phase `name` of `stats`, if there is a collector."""
+        return nullcontext() if self.stats is None else self.stats.phase(name)
+
+    def ink(self, color: Color) -> Color | int:
+        """`color` as drawn into the image, an index if there is a `palette`."""
+        return color if self.palette is None else self.palette.index(color)
+
+    def polygon(
+        self, verts: Sequence[tuple[int, int]], fill: Color, outline: Color
+    ) -> None:
+        verts = self.shift(verts)
+        if self.stats is not None:
+            self.stats.count("polygon")
+        if self.recorder is not None:
+            self.recorder.polygon(verts, fill, outline)
+            return
+        if self.canvas is not None:
+            self.canvas.polygon(verts, fill, outline)
+            return
+        self.image_draw.polygon(verts, fill=self.ink(fill), outline=self.ink(outline))
 
     def outline(self, color: Color, verts: Sequence[tuple[int, int]]) -> None:
+        verts = self.shift(verts)
+        if self.stats is not None:
+            self.stats.count("line", max(len(verts) - 1, 0))
+        if self.recorder is not None:
+            self.recorder.outline(color, verts)
+            return
+        if self.canvas is not None:
+            self.canvas.line(color, verts)
+            return
+        draw = self.image_draw
+        ink = self.ink(color)
         iterator = iter(verts)
         for previous_vert in iterator:
             for next_vert in iterator:
-                self.draw.line((previous_vert, next_vert), fill=color)
+                draw.line((previous_vert, next_vert), fill=ink)
                 previous_vert = next_vert
 
+    def text(self, xy: tuple[int, int], text: str, fill: Color) -> None:
+        if self.viewport is not None:
+            xy = (xy[0] - self.viewport[0], xy[1] - self.viewport[1])
+        if self.stats is not None:
+            self.stats.count("text")
+        if self.recorder is not None:
+            self.recorder.text(xy, text, fill)
+            return
+        if self.atlas is None:
+            self.image_draw.text(xy, text, fill=self.ink(fill))
+            return
+        if self.stats is not None:
+            self.stats.count(
+                "glyphs.hit" if text in self.atlas.words else "glyphs.miss"
+            )
+        mask = self.atlas.mask(text)
+        if mask.width == 0:
+            return
+        if self.canvas is not None:
+            self.canvas.bitmap(xy, mask, fill)
+        else:
+            self.image_draw.bitmap(xy, mask, fill=self.ink(fill))
+
+    def paste(
+        self, tile: Image, xy: tuple[int, int], mask: Image | None = None
+    ) -> None:
+        if self.viewport is not None:
+            xy = (xy[0] - self.viewport[0], xy[1] - self.viewport[1])
+        if self.stats is not None:
+            self.stats.count("paste")
+        if self.canvas is not None:
+            self.canvas.paste(tile, xy, mask)
+        elif self.palette is not None:
+            self.image.paste(self.palette.tile(tile), xy, mask)
+        else:
+            self.image.paste(tile, xy, mask)
+
+    def fill(self, box: tuple[int, int, int, int], color: Color) -> None:
+        box = self.shift_box(box)
+        if self.stats is not None:
+            self.stats.count("fill")
+        if self.recorder is not None:
+            self.recorder.fill(box, color)
+            return
+        if self.canvas is not None:
+            self.canvas.fill(box, color)
+        else:
+            self.image.paste(self.ink(color), box)  # type: ignore
+
     def text_bounding_box(self, text: str) -> BoundingBox:
-        return BoundingBox.from_bbox(self.draw.textbbox((0, 0), text))
+        if self.stats is not None:
+            self.stats.count("text_bounding_box")
+        if self.metrics is not None:
+            return self.metrics.text_bounding_box(text)
+        return BoundingBox.from_bbox(self.image_draw.textbbox((0, 0), text))
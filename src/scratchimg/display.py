@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import sys
+from array import array
+from enum import IntEnum
+from itertools import pairwise
+from typing import TYPE_CHECKING
+
+import msgspec
+from msgspec import Struct, field, structs
+
+from .misc import Color
+from .render import drawing, new_image
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence
+
+    import PIL.Image
+
+    from .context import Context
+    from .render import Script
+
+type Vert = tuple[int, int]
+type Encoded = tuple[int, int, list[Color], list[str], bytes, bytes]
+
+
+class Op(IntEnum):
+    """Display list op codes. Each is followed in `DisplayList.args` by palette
+    indices, `-1` for no color, then its coordinates:
+
+    - `POLYGON fill outline n x0 y0 ... xn yn`
+    - `LINES color n ax ay bx by ...`, `n` segments each including both ends
+    - `TEXT color string x y`, `string` indexing `DisplayList.strings`
+    - `FILL color x0 y0 x1 y1`
+    """
+
+    POLYGON = 0
+    LINES = 1
+    TEXT = 2
+    FILL = 3
+
+
+class DisplayList(Struct):
+    """The drawing of a laid-out script, recorded by `record` as op codes and
+    integer arguments in flat arrays, with colors and text interned.
+
+    Outlines of the same color drawn one after another are batched into a
+    single `LINES` op, and zero-length segments are dropped where a neighbour
+    already covers their pixel. `replay` draws the list through any `Context`,
+    so one layout can be rasterized by `ImageDraw` or a `raster.Raster`, again
+    and again, and `encode` makes it portable across processes and machines.
+    """
+
+    width: int = 0
+    height: int = 0
+    palette: list[Color] = field(default_factory=list)
+    strings: list[str] = field(default_factory=list)
+    ops: array[int] = field(default_factory=lambda: array("B"))
+    args: array[int] = field(default_factory=lambda: array("i"))
+    colors: dict[Color, int] = field(default_factory=dict)
+    words: dict[str, int] = field(default_factory=dict)
+    lines: int = -1
+
+    def color(self, color: Color) -> int:
+        if color is None:
+            return -1
+        index = self.colors.get(color)
+        if index is None:
+            index = self.colors[color] = len(self.palette)
+            self.palette.append(color)
+        return index
+
+    def polygon(self, verts: Sequence[Vert], fill: Color, outline: Color) -> None:
+        if fill is None and outline is None:
+            return
+        self.ops.append(Op.POLYGON)
+        self.args.extend((self.color(fill), self.color(outline), len(verts)))
+        for x, y in verts:
+            self.args.extend((x, y))
+        self.lines = -1
+
+    def outline(self, color: Color, verts: Sequence[Vert]) -> None:
+        if color is None or not verts[1:]:
+            return
+        segments = [(a, b) for a, b in pairwise(verts) if a != b] or [
+            (verts[0], verts[0])
+        ]
+        args = self.args
+        index = self.color(color)
+        if self.lines < 0 or args[self.lines] != index:
+            self.ops.append(Op.LINES)
+            self.lines = len(args)
+            args.extend((index, 0))
+        args[self.lines + 1] += len(segments)
+        for (ax, ay), (bx, by) in segments:
+            args.extend((ax, ay, bx, by))
+
+    def text(self, xy: Vert, text: str, fill: Color) -> None:
+        if fill is None or text == "":
+            return
+        string = self.words.get(text)
+        if string is None:
+            string = self.words[text] = len(self.strings)
+            self.strings.append(text)
+        self.ops.append(Op.TEXT)
+        self.args.extend((self.color(fill), string, *xy))
+        self.lines = -1
+
+    def fill(self, box: tuple[int, int, int, int], color: Color) -> None:
+        if color is None:
+            return
+        self.ops.append(Op.FILL)
+        self.args.extend((self.color(color), *box))
+        self.lines = -1
+
+    def replay(self, ctx: Context) -> None:
+        """Draw every op through `ctx`, in the order they were recorded."""
+        palette = self.palette
+        args = self.args
+        i = 0
+        for op in self.ops:
+            if op == Op.POLYGON:
+                fill, outline, n = args[i : i + 3]
+                coords = args[i + 3 : i + 3 + 2 * n]
+                ctx.polygon(
+                    list(zip(coords[::2], coords[1::2], strict=True)),
+                    fill=None if fill < 0 else palette[fill],
+                    outline=None if outline < 0 else palette[outline],
+                )
+                i += 3 + 2 * n
+            elif op == Op.LINES:
+                color, n = args[i : i + 2]
+                for verts in chains(args[i + 2 : i + 2 + 4 * n]):
+                    ctx.outline(palette[color], verts)
+                i += 2 + 4 * n
+            elif op == Op.TEXT:
+                color, string, x, y = args[i : i + 4]
+                ctx.text((x, y), self.strings[string], fill=palette[color])
+                i += 4
+            else:
+                color, x0, y0, x1, y1 = args[i : i + 5]
+                ctx.fill((x0, y0, x1, y1), palette[color])
+                i += 5
+
+    def to_image(self, ctx: Context, background: Color = None) -> PIL.Image.Image:
+        """Replay into a new image of the recorded size, drawing text with the
+        font of `ctx`."""
+        image = new_image((self.width, self.height), background, ctx.palette)
+        with drawing(ctx, image) as draw_ctx:
+            self.replay(draw_ctx)
+        return image
+
+    def encode(self) -> bytes:
+        """Serialize as MessagePack, with the arrays in little-endian order."""
+        args = self.args
+        if sys.byteorder == "big":
+            args = array("i", args)
+            args.byteswap()
+        return msgspec.msgpack.encode(
+            (
+                self.width,
+                self.height,
+                self.palette,
+                self.strings,
+                self.ops.tobytes(),
+                args.tobytes(),
+            )
+        )
+
+    @classmethod
+    def decode(cls, data: bytes) -> DisplayList:
+        width, height, palette, strings, ops, args = msgspec.msgpack.decode(
+            data, type=Encoded
+        )
+        display = cls(width, height, palette, strings)
+        display.ops.frombytes(ops)
+        display.args.frombytes(args)
+        if sys.byteorder == "big":
+            display.args.byteswap()
+        display.colors = {color: i for i, color in enumerate(palette)}
+        display.words = {string: i for i, string in enumerate(strings)}
+        return display
+
+
+def chains(coords: Sequence[int]) -> Iterator[list[Vert]]:
+    """Join consecutive segments that share an end back into polylines."""
+    verts: list[Vert] = []
+    for i in range(0, len(coords), 4):
+        ax, ay, bx, by = coords[i : i + 4]
+        if verts and verts[-1] != (ax, ay):
+            yield verts
+            verts = []
+        if not verts:
+            verts.append((ax, ay))
+        verts.append((bx, by))
+    if verts:
+        yield verts
+
+
+def record(script: Script, ctx: Context, padding: int = 0) -> DisplayList:
+    """Lay out `script` like `render_to_image` and record its drawing instead
+    of rasterizing it. Leaf and skin caches are bypassed, since they paste
+    images rather than shapes; `ctx` needs font metrics."""
+    layout = script.layout(ctx, padding, padding)
+    size = layout.bounding_box.outset(padding)
+    display = DisplayList(size.w, size.h)
+    script.paint(
+        structs.replace(
+            ctx, draw=None, leaves=None, skins=None, canvas=None, recorder=display
+        ),
+        layout,
+    )
+    return display
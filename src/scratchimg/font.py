@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import struct
+from pathlib import Path
+
+import PIL.Image
+from msgspec import Struct, field
+
+from .bounding_box import BoundingBox
+
+
+class FontMetrics(Struct, frozen=True):
+    """Glyph advances and line height of a PIL bitmap font (`.pil`).
+
+    Measures single-line text exactly as `ImageDraw.textbbox` does for the font,
+    without needing an image or an `ImageDraw`. A line break is measured as
+    the font's glyph for it, where `textbbox` would start a new line.
+    """
+
+    path: str
+    advances: tuple[int, ...]
+    height: int
+    baseline: int
+    advance: int | None
+    blank: bytes
+    glyphs: tuple[tuple[int, ...], ...]
+
+    @classmethod
+    def load(cls, path: str | Path) -> FontMetrics:
+        data = Path(path).read_bytes()
+        if not data.startswith(b"PILfont\n"):
+            msg = f"{path} is not a PILfont file"
+            raise SyntaxError(msg)
+        start = data.index(b"\nDATA\n") + 6
+        metrics = struct.unpack(">2560h", data[start : start + 256 * 20])
+        glyphs = [metrics[i * 10 : i * 10 + 10] for i in range(256)]
+        # PIL stops reading text at a NUL, so it never advances.
+        advances = (0, *(glyph[0] for glyph in glyphs[1:]))
+        y0 = min(0, *(glyph[3] for glyph in glyphs))
+        y1 = max(0, *(glyph[5] for glyph in glyphs))
+        widths = {advance for advance in advances if advance != 0}
+        return cls(
+            path=str(path),
+            advances=advances,
+            height=y1 - y0,
+            baseline=-y0,
+            advance=widths.pop() if len(widths) == 1 else None,
+            blank=bytes(i for i, advance in enumerate(advances) if advance == 0),
+            glyphs=tuple(glyph[2:] for glyph in glyphs),
+        )
+
+    def text_width(self, text: str) -> int:
+        data = text.encode("latin-1").partition(b"\0")[0]
+        if self.advance is not None:
+            return self.advance * len(data.translate(None, self.blank))
+        return sum(map(self.advances.__getitem__, data))
+
+    def text_bounding_box(self, text: str) -> BoundingBox:
+        return BoundingBox(self.text_width(text), self.height)
+
+
+class GlyphAtlas(Struct):
+    """Glyph bitmaps of a PIL bitmap font, and a cache of whole-text masks.
+
+    Text is composed from the glyph bitmaps once and then drawn by blitting the
+    cached mask with `ImageDraw.bitmap`, which fills it with any colour, so one
+    atlas serves every colour the font is drawn in.
+    """
+
+    metrics: FontMetrics
+    glyphs: tuple[PIL.Image.Image | None, ...]
+    max_words: int = 4096
+    words: dict[str, PIL.Image.Image] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: str | Path, max_words: int = 4096) -> GlyphAtlas:
+        metrics = FontMetrics.load(path)
+        path = Path(path)
+        for suffix in (".png", ".gif", ".pbm"):
+            image_path = path.with_suffix(suffix)
+            if image_path.exists():
+                break
+        else:
+            msg = f"cannot find glyph data file for {path}"
+            raise OSError(msg)
+        with PIL.Image.open(image_path) as image:
+            image = image.convert("L")
+        glyphs = tuple(
+            image.crop((sx0, sy0, sx1, sy1)) if sx1 > sx0 and sy1 > sy0 else None
+            for _, _, _, _, sx0, sy0, sx1, sy1 in metrics.glyphs
+        )
+        return cls(metrics, glyphs, max_words)
+
+    def mask(self, text: str) -> PIL.Image.Image:
+        mask = self.words.get(text)
+        if mask is None:
+            mask = self.compose(text)
+            if len(self.words) >= self.max_words:
+                del self.words[next(iter(self.words))]
+            self.words[text] = mask
+        return mask
+
+    def compose(self, text: str) -> PIL.Image.Image:
+        metrics = self.metrics
+        mask = PIL.Image.new("L", (metrics.text_width(text), metrics.height))
+        x = 0
+        for char in text.encode("latin-1").partition(b"\0")[0]:
+            glyph = self.glyphs[char]
+            if glyph is not None:
+                dx0, dy0 = metrics.glyphs[char][:2]
+                mask.paste(glyph, (x + dx0, metrics.baseline + dy0))
+            x += metrics.advances[char]
+        return mask
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import math
+from html import escape
+from typing import TYPE_CHECKING
+
+from msgspec import Struct
+
+from .blocks import Block, Boolean, C, Literal, Menu, Reporter
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Sequence
+
+    from .blocks import Node
+    from .layout import Layout
+
+type Box = tuple[int, int, int, int]
+type Level = list[tuple[Box, list[int]]]
+
+
+def union(boxes: Iterable[Box]) -> Box:
+    x0s, y0s, x1s, y1s = zip(*boxes, strict=True)
+    return min(x0s), min(y0s), max(x1s), max(y1s)
+
+
+def overlaps(a: Box, b: Box) -> bool:
+    return a[0] < b[2] and a[2] > b[0] and a[1] < b[3] and a[3] > b[1]
+
+
+def pack(boxes: Sequence[Box], fanout: int) -> Level:
+    """Group `boxes` into nodes of up to `fanout` by Sort-Tile-Recursive: slices
+    by center along the longer side of their extent, then runs by center along
+    the other. Slices are made about as long as they are wide, so the boxes of a
+    tall, narrow script are simply grouped from top to bottom."""
+    x0, y0, x1, y1 = union(boxes)
+    major, minor = (1, 0) if y1 - y0 > x1 - x0 else (0, 1)
+    aspect = max(y1 - y0, x1 - x0) / max(min(y1 - y0, x1 - x0), 1)
+    nodes = math.ceil(len(boxes) / fanout)
+    slices = min(nodes, math.ceil(math.sqrt(nodes * aspect)))
+    per_slice = math.ceil(nodes / slices) * fanout
+    order = sorted(
+        range(len(boxes)), key=lambda i: boxes[i][major] + boxes[i][major + 2]
+    )
+    level: Level = []
+    for start in range(0, len(order), per_slice):
+        strip = sorted(
+            order[start : start + per_slice],
+            key=lambda i: boxes[i][minor] + boxes[i][minor + 2],
+        )
+        for group_start in range(0, len(strip), fanout):
+            group = strip[group_start : group_start + fanout]
+            level.append((union(boxes[i] for i in group), group))
+    return level
+
+
+def label(node: Node) -> str:
+    """The words of `node` with the values of its inputs, as in `move 10 steps`."""
+    if isinstance(node, str):
+        return node
+    if isinstance(node, Literal | Menu):
+        return node.value
+    if isinstance(node, Block | C | Reporter | Boolean):
+        return " ".join(label(item) for item in node.items)
+    return ""
+
+
+class SpatialIndex(Struct):
+    """A packed R-tree over the rectangles of every node of a `Layout`, built
+    in O(n log n) by `build`.
+
+    Nodes are numbered in depth-first order with the index of their parent, so
+    a query can return the path from the root to the deepest node it hits.
+    Boxes are exclusive of their right and bottom edges.
+    """
+
+    layouts: list[Layout]
+    parents: list[int]
+    depths: list[int]
+    boxes: list[Box]
+    levels: list[Level]
+
+    @classmethod
+    def build(cls, layout: Layout, fanout: int = 16) -> SpatialIndex:
+        layouts: list[Layout] = []
+        parents: list[int] = []
+        depths: list[int] = []
+        stack = [(layout, -1, 0)]
+        while stack:
+            node, parent, depth = stack.pop()
+            index = len(layouts)
+            layouts.append(node)
+            parents.append(parent)
+            depths.append(depth)
+            stack.extend((child, index, depth + 1) for child in reversed(node.children))
+        boxes = [(node.x, node.y, node.x + node.w, node.y + node.h) for node in layouts]
+        levels = [pack(boxes, fanout)]
+        while len(levels[-1]) > 1:
+            levels.append(pack([box for box, _ in levels[-1]], fanout))
+        return cls(layouts, parents, depths, boxes, levels)
+
+    def query(self, box: Box) -> list[int]:
+        """Numbers of the nodes that overlap `box`, in depth-first order."""
+        levels = self.levels
+        found = [0]
+        for depth in range(len(levels) - 1, 0, -1):
+            below = levels[depth - 1]
+            found = [
+                child
+                for node in found
+                for child in levels[depth][node][1]
+                if overlaps(below[child][0], box)
+            ]
+        return sorted(
+            i
+            for node in found
+            for i in levels[0][node][1]
+            if overlaps(self.boxes[i], box)
+        )
+
+    def path(self, index: int) -> list[Layout]:
+        """The layouts from the root down to node `index`."""
+        path: list[Layout] = []
+        while index >= 0:
+            path.append(self.layouts[index])
+            index = self.parents[index]
+        return path[::-1]
+
+    def at(self, x: int, y: int) -> list[Layout]:
+        """The path to the deepest node under the pixel at `x`, `y`, the last
+        drawn where nodes overlap, or `[]` if there is none."""
+        hits = self.query((x, y, x + 1, y + 1))
+        if not hits:
+            return []
+        return self.path(max(hits, key=lambda i: (self.depths[i], i)))
+
+    def within(self, box: Box) -> list[list[Layout]]:
+        """The path to every node that overlaps `box`."""
+        return [self.path(i) for i in self.query(box)]
+
+    def hotspots(self, labels: bool = False) -> list[dict[str, object]]:
+        """Every node as `{"path", "kind", "box", "text"}`, JSON-ready, where
+        `path` is the child indices from the root. Plain text labels are left
+        out unless `labels` is true."""
+        spots: list[dict[str, object]] = []
+        paths: list[list[int]] = []
+        counts: list[int] = []
+        for i, layout in enumerate(self.layouts):
+            parent = self.parents[i]
+            if parent < 0:
+                path: list[int] = []
+            else:
+                path = [*paths[parent], counts[parent]]
+                counts[parent] += 1
+            paths.append(path)
+            counts.append(0)
+            if isinstance(layout.node, str) and not labels:
+                continue
+            spots.append(
+                {
+                    "path": path,
+                    "kind": type(layout.node).__name__,
+                    "box": list(self.boxes[i]),
+                    "text": label(layout.node),
+                }
+            )
+        return spots
+
+    def image_map(
+        self,
+        name: str,
+        href: Callable[[Layout], str | None] = lambda _: None,
+        labels: bool = False,
+    ) -> str:
+        """An HTML `<map>` with an `<area>` per node, titled with its text and
+        linked to `href(layout)` when that is not `None`. Deeper nodes come
+        first, since browsers pick the first area that matches."""
+        areas: list[str] = []
+        for i in reversed(range(len(self.layouts))):
+            layout = self.layouts[i]
+            if isinstance(layout.node, str) and not labels:
+                continue
+            x0, y0, x1, y1 = self.boxes[i]
+            link = href(layout)
+            areas.append(
+                f'  <area shape="rect" coords="{x0},{y0},{x1 - 1},{y1 - 1}"'
+                f' title="{escape(label(layout.node))}"'
+                + ("" if link is None else f' href="{escape(link)}"')
+                + ">\n"
+            )
+        return f'<map name="{escape(name)}">\n{"".join(areas)}</map>\n'
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from msgspec import Struct
+
+from .bounding_box import BoundingBox
+
+if TYPE_CHECKING:
+    from .blocks import Node
+
+
+class Layout(Struct, frozen=True):
+    """A node of a script after layout, in absolute pixel coordinates.
+
+    `inner` is the size of the node's content: the row of items of a block, or the
+    text of a label, `Literal` or `Menu`.
+    """
+
+    node: Node
+    x: int
+    y: int
+    w: int
+    h: int
+    inner: BoundingBox
+    children: tuple[Layout, ...] = ()
+
+    @property
+    def bounding_box(self) -> BoundingBox:
+        return BoundingBox(self.w, self.h)
+
+    def to_bbox(self) -> tuple[int, int, int, int]:
+        return self.bounding_box.to_bbox(self.x, self.y)
+
+    def intersects(self, box: tuple[int, int, int, int]) -> bool:
+        """Whether this node overlaps `box`, exclusive of its right and bottom
+        edges."""
+        x0, y0, x1, y1 = box
+        return (
+            self.x < x1
+            and self.x + self.w > x0
+            and self.y < y1
+            and self.y + self.h > y0
+        )
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import PIL.Image
+from msgspec import Struct, field, structs
+
+from .blocks import Block, Boolean, C, Reporter, Stack
+from .render import new_image, paint_into
+from .tiles import render_region
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from .blocks import Node, Sizes
+    from .context import Context
+    from .layout import Layout
+    from .misc import Color
+    from .render import Script
+    from .style import Style
+
+type Box = tuple[int, int, int, int]
+
+
+def children(node: Node) -> Iterator[Node]:
+    if isinstance(node, Block | Reporter | Boolean):
+        yield from (item for item in node.items if not isinstance(item, str))
+    elif isinstance(node, C):
+        yield from (item for item in node.items if not isinstance(item, str))
+        yield node.stack
+    elif isinstance(node, Stack):
+        yield from node.items
+
+
+def labels(node: Node) -> Iterator[str]:
+    if isinstance(node, Block | Reporter | Boolean | C):
+        yield from (item for item in node.items if isinstance(item, str))
+
+
+def extent(layout: Layout, style: Style) -> Box:
+    """The box `layout` paints into. Tabs are drawn whole, past the right edge
+    of a block or C narrower than them and below its bottom edge."""
+    x1 = layout.x + layout.w
+    y1 = layout.y + layout.h
+    if isinstance(layout.node, Block | C):
+        tab = style.tab_padding + 2 * style.tab_height + style.tab_width + 1
+        if isinstance(layout.node, Block):
+            x1 = max(x1, layout.x + style.block_roundness + tab)
+        else:
+            x1 = max(x1, layout.x + style.c_width + style.c_roundness + tab)
+        y1 += style.tab_height
+    return layout.x, layout.y, x1, y1
+
+
+def union(a: Box, b: Box) -> Box:
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def merge(boxes: list[Box]) -> list[Box]:
+    """Union boxes that overlap until none do."""
+    merged: list[Box] = []
+    for box in boxes:
+        i = 0
+        while i < len(merged):
+            other = merged[i]
+            if (
+                box[0] < other[2]
+                and other[0] < box[2]
+                and box[1] < other[3]
+                and other[1] < box[3]
+            ):
+                box = union(box, merged.pop(i))
+                i = 0
+            else:
+                i += 1
+        merged.append(box)
+    return merged
+
+
+class Document(Struct):
+    """A script rendered once and kept up to date as it is edited.
+
+    Nodes are edited in place with `edit`, which invalidates the measurements
+    and layouts of the node and its ancestors only. `update` then lays the
+    script out again, reusing the layout of every other node that has not moved,
+    diffs the result against the previous layout, and repaints just the damaged
+    rectangles of `image`. Each node must appear in the script only once.
+    """
+
+    script: Script
+    ctx: Context
+    padding: int = 0
+    background: Color = None
+    image: PIL.Image.Image = field(
+        default_factory=lambda: PIL.Image.new("RGBA", (0, 0))
+    )
+    layout: Layout | None = None
+    sizes: Sizes = field(default_factory=dict)
+    parents: dict[int, Node] = field(default_factory=dict)
+    dirty: set[int] = field(default_factory=set)
+
+    @classmethod
+    def open(
+        cls,
+        script: Script,
+        ctx: Context,
+        padding: int = 0,
+        background: Color = None,
+    ) -> Document:
+        document = cls(script, structs.replace(ctx, layouts={}), padding, background)
+        document.adopt(script)
+        layout = document.relayout()
+        size = layout.bounding_box.outset(padding)
+        document.image = new_image((size.w, size.h), background, ctx.palette)
+        paint_into(script, layout, document.ctx, document.image)
+        return document
+
+    def adopt(self, node: Node) -> None:
+        """Record the parent of every node under `node`."""
+        for child in children(node):
+            self.parents[id(child)] = node
+            self.adopt(child)
+
+    def relayout(self) -> Layout:
+        self.layout = self.script.layout(
+            self.ctx, self.padding, self.padding, self.sizes
+        )
+        return self.layout
+
+    def edit(self, node: Node, **changes: object) -> None:
+        """Set fields of `node`, such as the `value` of a `Literal` or the
+        `items` of a `Stack`, and mark it to be repainted by `update`. Children
+        the edit removes are forgotten, unless they were adopted elsewhere."""
+        before = list(children(node))
+        before_labels = list(labels(node))
+        for name, value in changes.items():
+            setattr(node, name, value)
+        after = {id(child) for child in children(node)}
+        for child in before:
+            if id(child) not in after and self.parents.get(id(child)) is node:
+                self.forget(child)
+        kept = {id(label) for label in labels(node)}
+        for label in before_labels:
+            if id(label) not in kept:
+                self.sizes.pop(id(label), None)
+        self.adopt(node)
+        self.dirty.add(id(node))
+        layouts = self.ctx.layouts if self.ctx.layouts is not None else {}
+        current: Node | None = node
+        while current is not None:
+            self.sizes.pop(id(current), None)
+            layouts.pop(id(current), None)
+            current = self.parents.get(id(current))
+
+    def forget(self, node: Node) -> None:
+        """Drop the measurements, layouts and parents of `node` and the nodes
+        under it, and the measurements of their labels."""
+        layouts = self.ctx.layouts if self.ctx.layouts is not None else {}
+        pending = [node]
+        while pending:
+            current = pending.pop()
+            self.sizes.pop(id(current), None)
+            layouts.pop(id(current), None)
+            self.parents.pop(id(current), None)
+            self.dirty.discard(id(current))
+            for label in labels(current):
+                self.sizes.pop(id(label), None)
+            pending.extend(children(current))
+
+    def update(self) -> list[Box]:
+        """Lay out and repaint what changed since the last update; returns the
+        repainted rectangles of `image`."""
+        old = self.layout
+        new = self.relayout()
+        damage: list[Box] = []
+        size = new.bounding_box.outset(self.padding)
+        width, height = self.image.size
+        if (size.w, size.h) != (width, height):
+            image = new_image((size.w, size.h), self.background, self.ctx.palette)
+            image.paste(
+                self.image.crop((0, 0, min(width, size.w), min(height, size.h)))
+            )
+            self.image = image
+            damage += [(width, 0, size.w, size.h), (0, height, size.w, size.h)]
+        if old is not None:
+            self.diff(old, new, damage)
+        self.dirty.clear()
+        repainted: list[Box] = []
+        for x0, y0, x1, y1 in merge(damage):
+            box = (max(x0, 0), max(y0, 0), min(x1, size.w), min(y1, size.h))
+            if box[2] > box[0] and box[3] > box[1]:
+                region = render_region(self.script, new, self.ctx, box, self.background)
+                self.image.paste(region, box[:2])
+                repainted.append(box)
+        return repainted
+
+    def diff(self, old: Layout, new: Layout, damage: list[Box]) -> None:
+        """Add to `damage` the rectangles where `new` paints differently from
+        `old`. A `Stack` paints nothing of its own, so only its items are
+        compared; other nodes are damaged whole when edited or moved."""
+        if old is new:
+            return
+        if id(new.node) not in self.dirty and old.node is new.node:
+            same = (old.x, old.y, old.w, old.h, old.inner) == (
+                new.x,
+                new.y,
+                new.w,
+                new.h,
+                new.inner,
+            )
+            if len(old.children) == len(new.children) and (
+                same or isinstance(new.node, Stack)
+            ):
+                for old_child, new_child in zip(
+                    old.children, new.children, strict=True
+                ):
+                    self.diff(old_child, new_child, damage)
+                return
+        # Labels are strings, which may be equal without being the same object.
+        if id(new.node) in self.dirty or old.node is new.node or old != new:
+            style = self.ctx.style
+            damage.append(union(extent(old, style), extent(new, style)))
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import PIL.Image
+import PIL.ImageColor
+from msgspec import Struct, field, structs
+
+from .style import Style
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from .misc import Color
+    from .style import BlockStyle
+
+type RGB = tuple[int, int, int]
+
+MAX_COLORS = 255
+
+
+def rgb(color: str | tuple[int, ...]) -> RGB:
+    r, g, b = (PIL.ImageColor.getrgb(color) if isinstance(color, str) else color)[:3]
+    return r, g, b
+
+
+class Palette(Struct):
+    """The colours of a set of styles, for drawing straight into 8-bit "P"
+    images, selected with `Context(palette=...)`.
+
+    Index 0 is transparent and the rest are `colors`, so every pixel is exact
+    and no quantization pass runs. One palette can be shared by any number of
+    renders, which then all have the same palette. RGBA tiles from the leaf and
+    skin caches are converted to indices once each, and at most `max_tiles` of
+    them are kept.
+    """
+
+    colors: list[RGB] = field(default_factory=list)
+    indices: dict[Color, int] = field(default_factory=dict)
+    max_tiles: int = 4096
+    tiles: dict[int, tuple[PIL.Image.Image, PIL.Image.Image]] = field(
+        default_factory=dict
+    )
+
+    @classmethod
+    def build(
+        cls,
+        styles: Iterable[BlockStyle],
+        style: Style | None = None,
+        background: Color = None,
+    ) -> Palette:
+        """A palette of every colour of `styles`, of the literals of `style` and
+        of `background`, such as `Palette.build(scratchimg.styles.values())`."""
+        style = Style() if style is None else style
+        palette = cls()
+        for color in (
+            *(
+                color
+                for block_style in styles
+                for color in structs.astuple(block_style)
+            ),
+            style.literal_background,
+            style.literal_foreground,
+            background,
+        ):
+            if color is not None:
+                palette.add(color)
+        return palette
+
+    def add(self, color: str | tuple[int, ...]) -> int:
+        value = rgb(color)
+        if value in self.colors:
+            return self.colors.index(value) + 1
+        if len(self.colors) >= MAX_COLORS:
+            msg = f"palette is full, cannot add {color!r}"
+            raise ValueError(msg)
+        self.colors.append(value)
+        return len(self.colors)
+
+    def index(self, color: Color) -> int | None:
+        """The index `color` is drawn with, `None` for no colour."""
+        if color is None:
+            return None
+        index = self.indices.get(color)
+        if index is None:
+            index = self.indices[color] = self.lookup(rgb(color))
+        return index
+
+    def lookup(self, value: RGB) -> int:
+        if value not in self.colors:
+            msg = f"{value!r} is not in the palette"
+            raise ValueError(msg)
+        return self.colors.index(value) + 1
+
+    def image(self, size: tuple[int, int], background: Color = None) -> PIL.Image.Image:
+        """A "P" image with this palette, transparent without a `background`."""
+        image = PIL.Image.new(
+            "P", size, 0 if background is None else self.index(background)
+        )
+        image.putpalette([0, 0, 0, *(c for color in self.colors for c in color)])
+        if background is None:
+            image.info["transparency"] = 0
+        return image
+
+    def tile(self, tile: PIL.Image.Image) -> PIL.Image.Image:
+        """An RGBA `tile` in this palette, transparent pixels as index 0.
+        Cached by identity, holding on to `tile` so its id is not reused."""
+        cached = self.tiles.get(id(tile))
+        if cached is None:
+            data = tile.convert("RGBA").tobytes()
+            indices: dict[bytes, int] = {}
+            pixels = bytearray()
+            for i in range(0, len(data), 4):
+                pixel = data[i : i + 4]
+                index = indices.get(pixel)
+                if index is None:
+                    r, g, b, a = pixel
+                    index = indices[pixel] = self.lookup((r, g, b)) if a else 0
+                pixels.append(index)
+            indexed = PIL.Image.frombytes("P", tile.size, bytes(pixels))
+            if len(self.tiles) >= self.max_tiles:
+                del self.tiles[next(iter(self.tiles))]
+            cached = self.tiles[id(tile)] = (tile, indexed)
+        return cached[1]
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+import PIL.Image
+import PIL.ImageColor
+from msgspec import Struct, field
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from numpy.typing import NDArray
+
+    from .misc import Color
+
+type Vert = tuple[int, int]
+type Tile = tuple[PIL.Image.Image, NDArray[np.uint32], NDArray[np.bool_] | None]
+# Where a mask goes relative to the first vertex of its shape, and the mask.
+type Shape = tuple[int, int, NDArray[np.bool_]]
+
+
+class Raster(Struct):
+    """NumPy raster backend, selected with `Context.load(font, backend=Raster())`.
+
+    Draws into the target image as one packed RGBA `uint32` per pixel. A
+    polygon is filled by computing the spans of all its rows at once (see
+    `spans`) and an outline by computing all its pixels at once (see
+    `segments`), each into a mask that is then painted with one assignment.
+    Block shapes have integer vertices joined by horizontal, vertical and 45°
+    edges, where these spans are exact, so the output is pixel-identical to
+    `ImageDraw`. Glyph masks and pasted tiles are expected to be binary, as the
+    ones this package draws are.
+
+    Packed colors, the arrays of glyph masks and cached tiles, and the masks of
+    shapes, keyed by their vertices relative to the first, outlive any one
+    image and are kept here, at most `max_tiles` tiles and `max_shapes` shapes.
+    """
+
+    max_tiles: int = 4096
+    max_shapes: int = 4096
+    inks: dict[str | tuple[int, ...], int] = field(default_factory=dict)
+    tiles: dict[int, Tile] = field(default_factory=dict)
+    shapes: dict[tuple[bool, tuple[Vert, ...]], Shape] = field(default_factory=dict)
+
+    def canvas(self, image: PIL.Image.Image) -> Canvas:
+        if image.mode not in {"RGB", "RGBA"}:
+            msg = f"the NumPy backend cannot draw into {image.mode} images"
+            raise ValueError(msg)
+        colors = image.getcolors(1)
+        if colors is not None and isinstance(color := colors[0][1], tuple):
+            # An image of one color, such as a new one, need not be read.
+            pixels = np.full(image.size[::-1], self.ink(color), dtype=np.uint32)
+            return Canvas(self, pixels, image.mode)
+        rgba = image if image.mode == "RGBA" else image.convert("RGBA")
+        return Canvas(self, np.array(rgba).view(np.uint32)[..., 0], image.mode)
+
+    def ink(self, color: str | tuple[int, ...]) -> int:
+        ink = self.inks.get(color)
+        if ink is None:
+            value = (
+                PIL.ImageColor.getcolor(color, "RGBA")
+                if isinstance(color, str)
+                else color
+            )
+            if isinstance(value, int):
+                value = (value, value, value)
+            rgba = np.array((*value[:4], 255)[:4], dtype=np.uint8)
+            ink = int(rgba.view(np.uint32)[0])
+            self.inks[color] = ink
+        return ink
+
+    def tile(self, image: PIL.Image.Image, mask: PIL.Image.Image | None) -> Tile:
+        """`image` packed like a canvas, and which of its pixels `mask` lets
+        through: `mask` is `image` itself, or `None` to paste all of them.
+        Cached by identity, holding on to `image` so its id is not reused."""
+        tile = self.tiles.get(id(image))
+        if tile is None:
+            if image.mode in {"RGB", "RGBA"}:
+                rgba = np.array(image.convert("RGBA"))
+                pixels = rgba.view(np.uint32)[..., 0]
+                opaque = None if mask is None else rgba[..., 3] != 0
+            else:
+                pixels = np.zeros(image.size[::-1], dtype=np.uint32)
+                opaque = np.asarray(image) != 0
+            if len(self.tiles) >= self.max_tiles:
+                del self.tiles[next(iter(self.tiles))]
+            tile = (image, pixels, opaque)
+            self.tiles[id(image)] = tile
+        return tile
+
+    def shape(self, verts: Sequence[Vert], closed: bool) -> Shape:
+        """The mask of the inside of `verts` if `closed`, otherwise of the
+        segments between them."""
+        x, y = verts[0]
+        key = (closed, tuple((vx - x, vy - y) for vx, vy in verts))
+        shape = self.shapes.get(key)
+        if shape is None:
+            shape = spans(key[1]) if closed else segments(key[1])
+            if len(self.shapes) >= self.max_shapes:
+                del self.shapes[next(iter(self.shapes))]
+            self.shapes[key] = shape
+        return shape
+
+
+class Canvas(Struct):
+    """The packed pixels of one image being drawn by a `Raster`."""
+
+    raster: Raster
+    pixels: NDArray[np.uint32]
+    mode: str
+
+    def to_image(self) -> PIL.Image.Image:
+        height, width = self.pixels.shape
+        image = PIL.Image.frombuffer(
+            "RGBA", (width, height), self.pixels, "raw", "RGBA", 0, 1
+        )
+        return image if self.mode == "RGBA" else image.convert(self.mode)
+
+    def fill(self, box: tuple[int, int, int, int], color: Color) -> None:
+        """Fill `box`, exclusive of its right and bottom edges, like
+        `Image.paste(color, box)`."""
+        if color is not None:
+            self.rect(box, self.raster.ink(color))
+
+    def rect(self, box: tuple[int, int, int, int], ink: int) -> None:
+        height, width = self.pixels.shape
+        x0, y0, x1, y1 = box
+        x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, width), min(y1, height)
+        if x1 > x0 and y1 > y0:
+            self.pixels[y0:y1, x0:x1] = ink
+
+    def polygon(self, verts: Sequence[Vert], fill: Color, outline: Color) -> None:
+        if fill is not None:
+            self.shape(verts, self.raster.shape(verts, closed=True), fill)
+        if outline is not None:
+            closed = (*verts, verts[0])
+            self.shape(closed, self.raster.shape(closed, closed=False), outline)
+
+    def line(self, color: Color, verts: Sequence[Vert]) -> None:
+        """Draw the segments between consecutive `verts`, each including both
+        of its ends, like one `ImageDraw.line` call per segment."""
+        if color is not None and len(verts) > 1:
+            self.shape(verts, self.raster.shape(verts, closed=False), color)
+
+    def shape(
+        self, verts: Sequence[Vert], shape: Shape, color: str | tuple[int, ...]
+    ) -> None:
+        dx, dy, mask = shape
+        height, width = mask.shape
+        region, cut = self.region((verts[0][0] + dx, verts[0][1] + dy), (width, height))
+        if region is not None:
+            region[mask[cut]] = self.raster.ink(color)
+
+    def bitmap(self, xy: Vert, mask: PIL.Image.Image, fill: Color) -> None:
+        """Paint `fill` through the non-zero pixels of an "L" `mask`."""
+        if fill is None:
+            return
+        region, cut = self.region(xy, mask.size)
+        _, _, opaque = self.raster.tile(mask, mask)
+        if region is not None and opaque is not None:
+            region[opaque[cut]] = self.raster.ink(fill)
+
+    def paste(
+        self, tile: PIL.Image.Image, xy: Vert, mask: PIL.Image.Image | None = None
+    ) -> None:
+        """`Image.paste(tile, xy, mask)` for an RGBA `tile` whose `mask` is
+        either itself, with alpha 0 or 255, or `None`."""
+        region, cut = self.region(xy, tile.size)
+        if region is None:
+            return
+        _, pixels, opaque = self.raster.tile(tile, mask)
+        if opaque is None:
+            region[...] = pixels[cut]
+        else:
+            region[opaque[cut]] = pixels[cut][opaque[cut]]
+
+    def region(
+        self, xy: Vert, size: tuple[int, int]
+    ) -> tuple[NDArray[np.uint32] | None, tuple[slice, slice]]:
+        """The part of the canvas covered by `size` pixels at `xy`, and the
+        matching slices of the source."""
+        height, width = self.pixels.shape
+        x, y = xy
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + size[0], width), min(y + size[1], height)
+        cut = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+        if x1 <= x0 or y1 <= y0:
+            return None, cut
+        return self.pixels[y0:y1, x0:x1], cut
+
+
+def spans(verts: Sequence[Vert]) -> Shape:
+    """The mask of the inside of `verts`, sampled at pixel centers with edges
+    half-open at the bottom, filled with a few array operations for all rows.
+
+    The crossings of every row with every sloped edge form one array, sorted
+    along each row and taken in pairs as the spans to fill; each span marks its
+    ends in a difference array whose running sum along the row is the mask.
+    """
+    edges = [
+        (ay, by, ax, bx) if ay < by else (by, ay, bx, ax)
+        for (ax, ay), (bx, by) in zip(verts, (*verts[1:], verts[0]), strict=True)
+        if ay != by
+    ]
+    x0 = min(x for x, _ in verts)
+    x1 = max(x for x, _ in verts) + 1
+    if not edges:
+        return x0, 0, np.zeros((0, x1 - x0), dtype=np.bool_)
+    y0 = min(edge[0] for edge in edges)
+    y1 = max(edge[1] for edge in edges)
+    if len(edges) % 2:
+        # Rows cross an even number of edges, so this one is never crossed.
+        edges.append((y1, y1 + 1, x1, x1))
+    tops, bottoms, starts, ends = np.array(edges).T
+    rows = np.arange(y0, y1)[:, None]
+    dy = rows - tops
+    xs = starts + dy * (ends - starts) // (bottoms - tops)
+    # Edges a row does not cross sort after the ones it does, in pairs that
+    # fill nothing.
+    xs[(dy < 0) | (rows >= bottoms)] = x1
+    xs.sort(axis=1)
+    # Room past the right edge for the ends of spans, and of those pairs.
+    size = x1 - x0 + 2
+    count = (y1 - y0) * size
+    base = np.arange(0, count, size)[:, None] - x0
+    marks = np.bincount((base + xs[:, 0::2]).ravel(), minlength=count)
+    marks -= np.bincount((base + xs[:, 1::2] + 1).ravel(), minlength=count)
+    return x0, y0, marks.reshape(y1 - y0, size)[:, : x1 - x0].cumsum(axis=1) > 0
+
+
+def segments(verts: Sequence[Vert]) -> Shape:
+    """The mask of the segments between consecutive `verts`, each including
+    both of its ends, set in one assignment: a pixel per step along the longer
+    axis of each segment, rounded to the nearest along the other."""
+    points = np.array(verts)
+    x0, y0 = points.min(axis=0)
+    x1, y1 = points.max(axis=0) + 1
+    starts, deltas = points[:-1], points[1:] - points[:-1]
+    steps = np.abs(deltas).max(axis=1)
+    segment = np.repeat(np.arange(len(steps)), steps + 1)
+    ends = np.cumsum(steps + 1)
+    t = np.arange(ends[-1]) - (ends - steps - 1)[segment]
+    divisor = np.maximum(steps, 1)[segment, None]
+    xy = starts[segment] + (t[:, None] * deltas[segment] + divisor // 2) // divisor
+    mask = np.zeros((y1 - y0, x1 - x0), dtype=np.bool_)
+    mask[xy[:, 1] - y0, xy[:, 0] - x0] = True
+    return int(x0), int(y0), mask
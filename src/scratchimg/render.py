@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import io
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+import PIL.Image
+import PIL.ImageDraw
+from msgspec import Struct, structs
+
+from .scale import upscale, write_png
+
+if TYPE_CHECKING:
+    from collections.abc import Generator
+
+    from .blocks import Block, Boolean, C, Reporter, Stack
+    from .context import Context
+    from .layout import Layout
+    from .misc import Color
+    from .palette import Palette
+
+type Script = Block | C | Stack | Reporter | Boolean
+
+
+class Output(Struct, frozen=True):
+    """How a rendered script is written out: with `padding` pixels around it on
+    `background`, transparent if `None`, encoded as `format` with each pixel a
+    `scale` by `scale` block."""
+
+    padding: int = 0
+    background: Color = None
+    format: str = "PNG"
+    scale: int = 1
+
+
+def render_into(
+    script: Script,
+    ctx: Context,
+    image: PIL.Image.Image,
+    xy: tuple[int, int] = (0, 0),
+) -> Layout:
+    """Render `script` into `image` with its top-left corner at `xy`."""
+    with ctx.phase("layout"):
+        layout = script.layout(ctx, *xy)
+    paint_into(script, layout, ctx, image)
+    return layout
+
+
+def paint_into(
+    script: Script, layout: Layout, ctx: Context, image: PIL.Image.Image
+) -> None:
+    with ctx.phase("raster"), drawing(ctx, image) as draw_ctx:
+        script.paint(draw_ctx, layout)
+
+
+@contextmanager
+def drawing(ctx: Context, image: PIL.Image.Image) -> Generator[Context]:
+    """A copy of `ctx` that draws into `image`, with its raster backend if it
+    has one, writing back to `image` on exit. The backend draws RGB and RGBA
+    images; others, such as the "P" images of a palette, use `ImageDraw`."""
+    ctx = structs.replace(ctx, draw=PIL.ImageDraw.Draw(image))
+    if ctx.backend is None or image.mode not in {"RGB", "RGBA"}:
+        yield ctx
+        return
+    if ctx.atlas is None:
+        msg = "a Context with a raster backend needs a GlyphAtlas for its text"
+        raise ValueError(msg)
+    ctx.canvas = ctx.backend.canvas(image)
+    yield ctx
+    image.paste(ctx.canvas.to_image())
+
+
+def new_image(
+    size: tuple[int, int], background: Color = None, palette: Palette | None = None
+) -> PIL.Image.Image:
+    """Transparent RGBA without a `background`, otherwise RGB filled with it,
+    or a "P" image of `palette` if there is one."""
+    if palette is not None:
+        return palette.image(size, background)
+    if background is None:
+        return PIL.Image.new("RGBA", size)
+    return PIL.Image.new("RGB", size, background)
+
+
+def render_to_image(
+    script: Script,
+    ctx: Context,
+    padding: int = 0,
+    background: Color = None,
+) -> PIL.Image.Image:
+    """Render `script` into a new image of exactly its size plus `padding`.
+
+    The script is laid out before the image is allocated, so `ctx` needs font
+    metrics (see `Context.load`) but no `ImageDraw`. Without a `background` the
+    image is transparent RGBA. An empty script with no padding gives a single
+    blank pixel, as no format can encode an empty image.
+    """
+    with ctx.phase("layout"):
+        layout = script.layout(ctx, padding, padding)
+    size = layout.bounding_box.outset(padding)
+    image = new_image((max(size.w, 1), max(size.h, 1)), background, ctx.palette)
+    paint_into(script, layout, ctx, image)
+    return image
+
+
+def render_to_bytes(
+    script: Script, ctx: Context, output: Output | None = None
+) -> bytes:
+    """`render_to_image` written out as `output` says, a PNG by default. With a
+    `ctx.disk` cache the image is looked up by content first and only rendered
+    on a miss."""
+    output = Output() if output is None else output
+    if ctx.disk is None:
+        image = render_to_image(script, ctx, output.padding, output.background)
+        with ctx.phase("encode"):
+            return encode(image, output)
+    key = ctx.disk.key(script, ctx, output)
+    data = ctx.disk.get(key)
+    if ctx.stats is not None:
+        ctx.stats.count("disk.miss" if data is None else "disk.hit")
+    if data is None:
+        image = render_to_image(script, ctx, output.padding, output.background)
+        with ctx.phase("encode"):
+            data = encode(image, output)
+        ctx.disk.put(key, data)
+    return data
+
+
+def encode(image: PIL.Image.Image, output: Output) -> bytes:
+    """`image` as `output.format`, with each pixel an `output.scale` square; its
+    padding and background are already drawn. PNGs are upscaled as they are
+    written, see `scale.write_png`."""
+    buffer = io.BytesIO()
+    if output.scale != 1 and output.format.upper() == "PNG":
+        write_png(image, buffer, output.scale)
+    else:
+        upscale(image, output.scale).save(buffer, output.format)
+    return buffer.getvalue()
@@ -0,0 +1,446 @@
+from __future__ import annotations
+
+import re
+import zipfile
+from typing import TYPE_CHECKING
+
+import msgspec
+from msgspec import Struct, field
+
+from . import styles
+from .blocks import Block, Boolean, BoxItem, C, Literal, Menu, Reporter, Stack
+from .syntax import merge
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from .render import Script
+    from .style import BlockStyle
+
+type Primitive = list[str | int | float | None]
+type Input = list[int | str | Primitive | None]
+
+# Shape and label of each opcode. `{NAME}` is the input or dropdown field NAME,
+# `<NAME>` the boolean input NAME and `$NAME` the text of field NAME.
+opcodes = """
+OPCODE                              SHAPE     TEMPLATE
+motion_movesteps                    block     move {STEPS} steps
+motion_turnright                    block     turn right {DEGREES} degrees
+motion_turnleft                     block     turn left {DEGREES} degrees
+motion_goto                         block     go to {TO}
+motion_gotoxy                       block     go to x: {X} y: {Y}
+motion_glideto                      block     glide {SECS} secs to {TO}
+motion_glidesecstoxy                block     glide {SECS} secs to x: {X} y: {Y}
+motion_pointindirection             block     point in direction {DIRECTION}
+motion_pointtowards                 block     point towards {TOWARDS}
+motion_changexby                    block     change x by {DX}
+motion_setx                         block     set x to {X}
+motion_changeyby                    block     change y by {DY}
+motion_sety                         block     set y to {Y}
+motion_ifonedgebounce               block     if on edge, bounce
+motion_setrotationstyle             block     set rotation style {STYLE}
+motion_xposition                    reporter  x position
+motion_yposition                    reporter  y position
+motion_direction                    reporter  direction
+looks_sayforsecs                    block     say {MESSAGE} for {SECS} seconds
+looks_say                           block     say {MESSAGE}
+looks_thinkforsecs                  block     think {MESSAGE} for {SECS} seconds
+looks_think                         block     think {MESSAGE}
+looks_switchcostumeto               block     switch costume to {COSTUME}
+looks_nextcostume                   block     next costume
+looks_switchbackdropto              block     switch backdrop to {BACKDROP}
+looks_switchbackdroptoandwait       block     switch backdrop to {BACKDROP} and wait
+looks_nextbackdrop                  block     next backdrop
+looks_changesizeby                  block     change size by {CHANGE}
+looks_setsizeto                     block     set size to {SIZE} %
+looks_changeeffectby                block     change {EFFECT} effect by {CHANGE}
+looks_seteffectto                   block     set {EFFECT} effect to {VALUE}
+looks_cleargraphiceffects           block     clear graphic effects
+looks_show                          block     show
+looks_hide                          block     hide
+looks_gotofrontback                 block     go to {FRONT_BACK} layer
+looks_goforwardbackwardlayers       block     go {FORWARD_BACKWARD} {NUM} layers
+looks_costumenumbername             reporter  costume {NUMBER_NAME}
+looks_backdropnumbername            reporter  backdrop {NUMBER_NAME}
+looks_size                          reporter  size
+sound_playuntildone                 block     play sound {SOUND_MENU} until done
+sound_play                          block     start sound {SOUND_MENU}
+sound_stopallsounds                 block     stop all sounds
+sound_changeeffectby                block     change {EFFECT} effect by {VALUE}
+sound_seteffectto                   block     set {EFFECT} effect to {VALUE}
+sound_cleareffects                  block     clear sound effects
+sound_changevolumeby                block     change volume by {VOLUME}
+sound_setvolumeto                   block     set volume to {VOLUME} %
+sound_volume                        reporter  volume
+event_whenflagclicked               block     when flag clicked
+event_whenkeypressed                block     when {KEY_OPTION} key pressed
+event_whenthisspriteclicked         block     when this sprite clicked
+event_whenstageclicked              block     when stage clicked
+event_whenbackdropswitchesto        block     when backdrop switches to {BACKDROP}
+event_whengreaterthan               block     when {WHENGREATERTHANMENU} > {VALUE}
+event_whenbroadcastreceived         block     when I receive {BROADCAST_OPTION}
+event_broadcast                     block     broadcast {BROADCAST_INPUT}
+event_broadcastandwait              block     broadcast {BROADCAST_INPUT} and wait
+control_wait                        block     wait {DURATION} seconds
+control_repeat                      c         repeat {TIMES}
+control_forever                     cap-c     forever
+control_if                          c         if <CONDITION> then
+control_if_else                     c         if <CONDITION> then
+control_wait_until                  block     wait until <CONDITION>
+control_repeat_until                c         repeat until <CONDITION>
+control_while                       c         while <CONDITION>
+control_for_each                    c         for each {VARIABLE} in {VALUE}
+control_stop                        cap       stop {STOP_OPTION}
+control_start_as_clone              block     when I start as a clone
+control_create_clone_of             block     create clone of {CLONE_OPTION}
+control_delete_this_clone           cap       delete this clone
+sensing_touchingobject              boolean   touching {TOUCHINGOBJECTMENU} ?
+sensing_touchingcolor               boolean   touching color {COLOR} ?
+sensing_coloristouchingcolor        boolean   color {COLOR} is touching {COLOR2} ?
+sensing_distanceto                  reporter  distance to {DISTANCETOMENU}
+sensing_askandwait                  block     ask {QUESTION} and wait
+sensing_answer                      reporter  answer
+sensing_keypressed                  boolean   key {KEY_OPTION} pressed?
+sensing_mousedown                   boolean   mouse down?
+sensing_mousex                      reporter  mouse x
+sensing_mousey                      reporter  mouse y
+sensing_setdragmode                 block     set drag mode {DRAG_MODE}
+sensing_loudness                    reporter  loudness
+sensing_timer                       reporter  timer
+sensing_resettimer                  block     reset timer
+sensing_of                          reporter  {PROPERTY} of {OBJECT}
+sensing_current                     reporter  current {CURRENTMENU}
+sensing_dayssince2000               reporter  days since 2000
+sensing_username                    reporter  username
+operator_add                        reporter  {NUM1} + {NUM2}
+operator_subtract                   reporter  {NUM1} - {NUM2}
+operator_multiply                   reporter  {NUM1} * {NUM2}
+operator_divide                     reporter  {NUM1} / {NUM2}
+operator_random                     reporter  pick random {FROM} to {TO}
+operator_gt                         boolean   {OPERAND1} > {OPERAND2}
+operator_lt                         boolean   {OPERAND1} < {OPERAND2}
+operator_equals                     boolean   {OPERAND1} = {OPERAND2}
+operator_and                        boolean   <OPERAND1> and <OPERAND2>
+operator_or                         boolean   <OPERAND1> or <OPERAND2>
+operator_not                        boolean   not <OPERAND>
+operator_join                       reporter  join {STRING1} {STRING2}
+operator_letter_of                  reporter  letter {LETTER} of {STRING}
+operator_length                     reporter  length of {STRING}
+operator_contains                   boolean   {STRING1} contains {STRING2} ?
+operator_mod                        reporter  {NUM1} mod {NUM2}
+operator_round                      reporter  round {NUM}
+operator_mathop                     reporter  {OPERATOR} of {NUM}
+data_variable                       reporter  $VARIABLE
+data_setvariableto                  block     set {VARIABLE} to {VALUE}
+data_changevariableby               block     change {VARIABLE} by {VALUE}
+data_showvariable                   block     show variable {VARIABLE}
+data_hidevariable                   block     hide variable {VARIABLE}
+data_listcontents                   reporter  $LIST
+data_addtolist                      block     add {ITEM} to {LIST}
+data_deleteoflist                   block     delete {INDEX} of {LIST}
+data_deletealloflist                block     delete all of {LIST}
+data_insertatlist                   block     insert {ITEM} at {INDEX} of {LIST}
+data_replaceitemoflist              block     replace item {INDEX} of {LIST} with {ITEM}
+data_itemoflist                     reporter  item {INDEX} of {LIST}
+data_itemnumoflist                  reporter  item # of {ITEM} in {LIST}
+data_lengthoflist                   reporter  length of {LIST}
+data_listcontainsitem               boolean   {LIST} contains {ITEM} ?
+data_showlist                       block     show list {LIST}
+data_hidelist                       block     hide list {LIST}
+argument_reporter_string_number     reporter  $VALUE
+argument_reporter_boolean           boolean   $VALUE
+"""
+
+OPCODES: dict[str, tuple[str, str]] = {}
+for line in opcodes.split("\n"):
+    line = line.strip()
+    if line == "":
+        continue
+    if line.startswith("OPCODE"):
+        continue
+    opcode, shape, template = line.split(maxsplit=2)
+    OPCODES[opcode] = (shape, template)
+
+CATEGORIES = {
+    "motion": "motion",
+    "looks": "looks",
+    "sound": "sound",
+    "event": "events",
+    "control": "control",
+    "sensing": "sensing",
+    "operator": "operators",
+    "data": "variables",
+}
+
+# Shadow blocks that hold a typed-in value rather than a dropdown.
+LITERALS = {
+    "math_number",
+    "math_positive_number",
+    "math_whole_number",
+    "math_integer",
+    "math_angle",
+    "text",
+    "colour_picker",
+}
+
+MENU_TEXT = {
+    "_mouse_": "mouse-pointer",
+    "_random_": "random position",
+    "_edge_": "edge",
+    "_myself_": "myself",
+    "_stage_": "Stage",
+}
+
+ARGUMENT = re.compile(r"(%[snb])")
+
+
+class Mutation(Struct):
+    proccode: str = ""
+    argumentids: str = "[]"
+    argumentnames: str = "[]"
+    hasnext: str | bool | None = None
+
+
+class ProjectBlock(Struct, rename="camel"):
+    opcode: str
+    next_id: str | None = field(default=None, name="next")
+    inputs: dict[str, Input] = field(default_factory=dict)
+    fields: dict[str, Primitive] = field(default_factory=dict)
+    shadow: bool = False
+    top_level: bool = False
+    mutation: Mutation | None = None
+
+
+class Target(Struct, rename="camel"):
+    name: str
+    is_stage: bool = False
+    blocks: dict[str, ProjectBlock | Primitive] = field(default_factory=dict)
+
+
+class Project(Struct):
+    """`project.json` with its targets left undecoded, to be decoded one at a
+    time."""
+
+    targets: list[msgspec.Raw]
+
+
+project_decoder = msgspec.json.Decoder(Project)
+target_decoder = msgspec.json.Decoder(Target)
+
+
+def category(opcode: str) -> BlockStyle:
+    if opcode.startswith("data_") and "list" in opcode:
+        return styles["lists"]
+    return styles[CATEGORIES.get(opcode.split("_", 1)[0], "custom")]
+
+
+def one_line(text: str) -> str:
+    """`text` with its line breaks turned into spaces.
+
+    Text inputs of a project can hold line breaks, but labels are measured and
+    drawn as single lines (see `FontMetrics`).
+    """
+    return text.replace("\n", " ")
+
+
+def primitive(value: Primitive) -> Literal | Menu | Reporter:
+    """A value typed in place of a shadow block, `[type, value, ...]`."""
+    text = str(value[1]) if len(value) > 1 and value[1] is not None else ""
+    text = one_line(text)
+    match value[0]:
+        case 11:
+            return Menu(text)
+        case 12:
+            return Reporter(styles["variables"], [text])
+        case 13:
+            return Reporter(styles["lists"], [text])
+        case _:
+            return Literal(text)
+
+
+class Walker(Struct):
+    """Builds scripts from a target's flat `blocks` dict by following `next`
+    links along stacks and `inputs` links into reporters and C mouths."""
+
+    blocks: dict[str, ProjectBlock | Primitive]
+
+    def stack(self, block_id: str | None) -> Stack:
+        items: list[Block | C] = []
+        while block_id is not None:
+            block = self.blocks.get(block_id)
+            if not isinstance(block, ProjectBlock):
+                break
+            items.extend(self.statement(block))
+            block_id = block.next_id
+        return Stack(items)
+
+    def statement(self, block: ProjectBlock) -> list[Block | C]:
+        shape, _ = OPCODES.get(block.opcode, ("block", ""))
+        style = category(block.opcode)
+        items = self.items(block)
+        is_last = shape in {"cap", "cap-c"} and not has_next(block)
+        if shape not in {"c", "cap-c"}:
+            return [Block(style, items, is_last=is_last)]
+        mouth = C(style, items, self.substack(block, "SUBSTACK"), is_last=is_last)
+        if block.opcode != "control_if_else":
+            return [mouth]
+        return [mouth, C(style, ["else"], self.substack(block, "SUBSTACK2"))]
+
+    def substack(self, block: ProjectBlock, name: str) -> Stack:
+        value = self.link(block, name)
+        return self.stack(value if isinstance(value, str) else None)
+
+    def reporter(self, block_id: str) -> BoxItem:
+        block = self.blocks.get(block_id)
+        if block is None:
+            return Literal("")
+        if isinstance(block, list):
+            return primitive(block)
+        if block.opcode in LITERALS:
+            return Literal(next((self.text(block, name) for name in block.fields), ""))
+        if block.shadow and not block.inputs and len(block.fields) == 1:
+            return Menu(self.text(block, next(iter(block.fields))))
+        shape, _ = OPCODES.get(block.opcode, ("reporter", ""))
+        if shape == "boolean":
+            return Boolean(category(block.opcode), self.items(block))
+        return Reporter(category(block.opcode), self.items(block))
+
+    def items(self, block: ProjectBlock) -> list[BoxItem]:
+        if block.opcode == "procedures_call":
+            return self.call(block)
+        if block.opcode == "procedures_definition":
+            return self.definition(block)
+        template = OPCODES.get(block.opcode, ("", ""))[1]
+        if template == "":
+            names = [name for name in block.inputs if not name.startswith("SUBSTACK")]
+            return merge([block.opcode, *(self.value(block, name) for name in names)])
+        items: list[BoxItem] = []
+        for word in template.split():
+            if word.startswith("{") and word.endswith("}"):
+                items.append(self.value(block, word[1:-1]))
+            elif word[:1] == "<" and word[-1:] == ">" and word not in {"<", ">"}:
+                items.append(self.condition(block, word[1:-1]))
+            elif word.startswith("$"):
+                items.append(self.text(block, word[1:]))
+            else:
+                items.append(word)
+        return merge(items)
+
+    def link(self, block: ProjectBlock, name: str) -> str | Primitive | None:
+        """The block id or primitive in input `name`, `[shadow type, value,
+        obscured shadow]`, preferring the value over the shadow."""
+        entry = block.inputs.get(name, [])
+        for value in entry[1:]:
+            if isinstance(value, str | list):
+                return value
+        return None
+
+    def value(self, block: ProjectBlock, name: str) -> BoxItem:
+        if name in block.fields and name not in block.inputs:
+            return Menu(self.text(block, name))
+        value = self.link(block, name)
+        if isinstance(value, list):
+            return primitive(value)
+        if isinstance(value, str):
+            return self.reporter(value)
+        return Literal("")
+
+    def condition(self, block: ProjectBlock, name: str) -> BoxItem:
+        value = self.link(block, name)
+        if isinstance(value, str):
+            return self.reporter(value)
+        return Boolean(category(block.opcode), [])
+
+    def text(self, block: ProjectBlock, name: str) -> str:
+        value = block.fields.get(name, [None])[0]
+        text = "" if value is None else one_line(str(value))
+        if name == "EFFECT":
+            text = text.lower()
+        return MENU_TEXT.get(text, text)
+
+    def call(self, block: ProjectBlock) -> list[BoxItem]:
+        mutation = block.mutation or Mutation()
+        ids = iter(msgspec.json.decode(mutation.argumentids, type=list[str]))
+        items: list[BoxItem] = []
+        for part in ARGUMENT.split(mutation.proccode):
+            if part in {"%s", "%n"}:
+                items.append(self.value(block, next(ids, "")))
+            elif part == "%b":
+                items.append(self.condition(block, next(ids, "")))
+            elif part.strip():
+                items.append(part.strip())
+        return items
+
+    def definition(self, block: ProjectBlock) -> list[BoxItem]:
+        prototype = self.blocks.get(str(self.link(block, "custom_block")))
+        if not isinstance(prototype, ProjectBlock) or prototype.mutation is None:
+            return ["define"]
+        mutation = prototype.mutation
+        names = iter(msgspec.json.decode(mutation.argumentnames, type=list[str]))
+        items: list[BoxItem] = ["define"]
+        for part in ARGUMENT.split(mutation.proccode):
+            if part in {"%s", "%n"}:
+                items.append(Reporter(styles["custom"], [next(names, "")]))
+            elif part == "%b":
+                items.append(Boolean(styles["custom"], [next(names, "")]))
+            elif part.strip():
+                items.append(part.strip())
+        return items
+
+
+def has_next(block: ProjectBlock) -> bool:
+    """`stop other scripts in sprite` is the one `control_stop` that is not a
+    cap; its mutation says so."""
+    return block.mutation is not None and block.mutation.hasnext in {"true", True}
+
+
+def target_scripts(target: Target) -> Iterator[tuple[str, Script]]:
+    walker = Walker(target.blocks)
+    for block_id, block in target.blocks.items():
+        key = f"{target.name}/{block_id}"
+        if isinstance(block, list):
+            script = primitive(block)
+            if isinstance(script, Reporter):
+                yield key, script
+            continue
+        if not block.top_level or block.shadow:
+            continue
+        shape, _ = OPCODES.get(block.opcode, ("block", ""))
+        if shape in {"reporter", "boolean"}:
+            script = walker.reporter(block_id)
+            if isinstance(script, Reporter | Boolean):
+                yield key, script
+        else:
+            yield key, walker.stack(block_id)
+
+
+def scripts(data: bytes) -> Iterator[tuple[str, Script]]:
+    """Scripts of a `project.json`, keyed `"{target name}/{top block id}"`.
+
+    Targets are decoded one at a time as the iterator advances, so only the
+    raw JSON and a single decoded target are held at once.
+    """
+    try:
+        project = project_decoder.decode(data)
+    except msgspec.DecodeError as error:
+        msg = f"invalid project.json: {error}"
+        raise SyntaxError(msg) from error
+    for raw in project.targets:
+        try:
+            target = target_decoder.decode(raw)
+        except msgspec.DecodeError as error:
+            msg = f"invalid target in project.json: {error}"
+            raise SyntaxError(msg) from error
+        yield from target_scripts(target)
+
+
+def load(path: str | Path) -> Iterator[tuple[str, Script]]:
+    """Scripts of the Scratch 3 project at `path`, see `scripts`."""
+    with zipfile.ZipFile(path) as archive:
+        try:
+            data = archive.read("project.json")
+        except KeyError as error:
+            msg = f"{path} has no project.json"
+            raise SyntaxError(msg) from error
+    yield from scripts(data)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import struct
+import zlib
+from typing import TYPE_CHECKING, Protocol
+
+import PIL.Image
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+COLOR_TYPES = {"L": (0, 1), "RGB": (2, 3), "P": (3, 1), "RGBA": (6, 4)}
+SIGNATURE = b"\x89PNG\r\n\x1a\n"
+IDAT_SIZE = 1 << 16
+
+
+class Writable(Protocol):
+    def write(self, data: bytes, /) -> object: ...
+
+
+def check_scale(scale: int) -> None:
+    if scale < 1:
+        msg = f"scale must be a positive integer, not {scale}"
+        raise ValueError(msg)
+
+
+def upscale(image: PIL.Image.Image, scale: int) -> PIL.Image.Image:
+    """`image` with each pixel repeated into a `scale` by `scale` block."""
+    check_scale(scale)
+    if scale == 1:
+        return image
+    return image.resize(
+        (image.width * scale, image.height * scale), PIL.Image.Resampling.NEAREST
+    )
+
+
+def chunk(kind: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + kind
+        + data
+        + struct.pack(">I", zlib.crc32(kind + data))
+    )
+
+
+def rows(image: PIL.Image.Image, scale: int, band: int) -> Iterator[bytes]:
+    """The filtered scanlines of `upscale(image, scale)`, widening `band` rows
+    at a time. Each row is sent once unfiltered and then `scale - 1` times as
+    all zeros with the Up filter, which repeats the row above."""
+    width = image.width * scale
+    size = width * COLOR_TYPES[image.mode][1]
+    repeat = b"\x02" + bytes(size)
+    for top in range(0, image.height, band):
+        strip = image.crop((0, top, image.width, min(top + band, image.height)))
+        if scale > 1:
+            strip = strip.resize((width, strip.height), PIL.Image.Resampling.NEAREST)
+        data = strip.tobytes()
+        for start in range(0, len(data), size):
+            yield b"\x00" + data[start : start + size]
+            for _ in range(scale - 1):
+                yield repeat
+
+
+def write_png(
+    image: PIL.Image.Image,
+    out: Writable,
+    scale: int = 1,
+    compress_level: int = 6,
+    band: int = 64,
+) -> None:
+    """Write `upscale(image, scale)` to `out` as a PNG without building it:
+    rows are widened `band` at a time and compressed as they are made. Takes
+    "L", "RGB", "RGBA" and "P" images, keeping the palette and the transparent
+    index of the latter."""
+    if image.mode not in COLOR_TYPES:
+        msg = f"cannot write {image.mode} images as PNG"
+        raise ValueError(msg)
+    check_scale(scale)
+    out.write(SIGNATURE)
+    out.write(
+        chunk(
+            b"IHDR",
+            struct.pack(
+                ">IIBBBBB",
+                image.width * scale,
+                image.height * scale,
+                8,
+                COLOR_TYPES[image.mode][0],
+                0,
+                0,
+                0,
+            ),
+        )
+    )
+    if image.mode == "P":
+        palette = image.getpalette() or []
+        out.write(chunk(b"PLTE", bytes(palette)))
+        transparency = image.info.get("transparency")
+        if isinstance(transparency, int):
+            out.write(chunk(b"tRNS", b"\xff" * transparency + b"\x00"))
+    compressor = zlib.compressobj(compress_level)
+    pending = bytearray()
+    for row in rows(image, scale, band):
+        pending += compressor.compress(row)
+        if len(pending) >= IDAT_SIZE:
+            out.write(chunk(b"IDAT", bytes(pending)))
+            pending.clear()
+    pending += compressor.flush()
+    out.write(chunk(b"IDAT", bytes(pending)))
+    out.write(chunk(b"IEND", b""))
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import statistics
+import sys
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from typing import TYPE_CHECKING
+
+import msgspec
+from msgspec import Struct, field, structs
+
+from .batch import Options, initialize, render_chunk
+from .blocks import Block, Boolean, C, Reporter, Stack
+from .syntax import parse
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+    from .render import Script
+
+type Response = tuple[HTTPStatus, str, bytes]
+
+
+class Server(Struct):
+    """HTTP service that renders scripts to PNG on a process pool.
+
+    `POST /render` takes scratchblocks-style text, or a JSON tree with
+    `Content-Type: application/json`, and returns the PNG. Concurrent requests
+    for the same script share one render, recent results are kept in an LRU of
+    `max_entries`, and at most `max_pending` renders are queued before requests
+    are refused with 503. A script the font cannot encode is refused with 400
+    and any other failed render answered with 500, and both are counted as
+    `errors`. `GET /metrics` reports latency percentiles and queue depth as
+    JSON.
+    """
+
+    pool: Executor
+    max_pending: int = 64
+    max_entries: int = 1024
+    max_body: int = 2**20
+    pending: dict[str, asyncio.Future[bytes]] = field(default_factory=dict)
+    images: OrderedDict[str, bytes] = field(default_factory=OrderedDict)
+    latencies: deque[float] = field(default_factory=lambda: deque(maxlen=10000))
+    requests: int = 0
+    renders: int = 0
+    coalesced: int = 0
+    hits: int = 0
+    rejected: int = 0
+    errors: int = 0
+    decoder: msgspec.json.Decoder[Block | C | Stack | Reporter | Boolean] = field(
+        default_factory=lambda: msgspec.json.Decoder(
+            Block | C | Stack | Reporter | Boolean
+        )
+    )
+    encoder: msgspec.msgpack.Encoder = field(default_factory=msgspec.msgpack.Encoder)
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while request := await reader.readline():
+                method, target, _ = request.decode("latin-1").split(" ", 2)
+                headers: dict[str, str] = {}
+                while (line := await reader.readline()) not in {b"\r\n", b"\n", b""}:
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", "0"))
+                if length > self.max_body:
+                    status, content_type, body = error(
+                        HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+                    )
+                    headers["connection"] = "close"
+                else:
+                    body = await reader.readexactly(length)
+                    status, content_type, body = await self.respond(
+                        method, target, headers, body
+                    )
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1")
+                    + body
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(
+        self, method: str, target: str, headers: dict[str, str], body: bytes
+    ) -> Response:
+        path = target.partition("?")[0]
+        if path == "/metrics" and method == "GET":
+            return (
+                HTTPStatus.OK,
+                "application/json",
+                msgspec.json.encode(self.metrics()),
+            )
+        if path != "/render":
+            return error(HTTPStatus.NOT_FOUND)
+        if method != "POST":
+            return error(HTTPStatus.METHOD_NOT_ALLOWED)
+        start = asyncio.get_running_loop().time()
+        self.requests += 1
+        try:
+            if headers.get("content-type", "").startswith("application/json"):
+                script = self.decoder.decode(body)
+            else:
+                script = parse(body.decode())
+        except (SyntaxError, UnicodeDecodeError, msgspec.DecodeError) as exception:
+            return error(HTTPStatus.BAD_REQUEST, str(exception))
+        status, content_type, data = await self.png(script)
+        if status == HTTPStatus.OK:
+            self.latencies.append(asyncio.get_running_loop().time() - start)
+        return status, content_type, data
+
+    async def png(self, script: Script) -> Response:
+        """`render` as a response, with its failures counted as `errors`."""
+        try:
+            data = await self.render(script)
+        except UnicodeEncodeError as exception:
+            self.errors += 1
+            return error(HTTPStatus.BAD_REQUEST, str(exception))
+        except Exception as exception:  # noqa: BLE001 - answered with 500
+            self.errors += 1
+            sys.stderr.write(f"render failed: {exception!r}\n")
+            return error(HTTPStatus.INTERNAL_SERVER_ERROR)
+        if data is None:
+            return error(HTTPStatus.SERVICE_UNAVAILABLE)
+        return HTTPStatus.OK, "image/png", data
+
+    async def render(self, script: Script) -> bytes | None:
+        """The PNG of `script` from the LRU, from an identical render already in
+        flight, or from a new render; `None` if the queue is full."""
+        chunk = self.encoder.encode([script])
+        key = hashlib.blake2b(chunk, digest_size=16).hexdigest()
+        data = self.images.get(key)
+        if data is not None:
+            self.hits += 1
+            self.images.move_to_end(key)
+            return data
+        future = self.pending.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+        if len(self.pending) >= self.max_pending:
+            self.rejected += 1
+            return None
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending[key] = future
+        self.renders += 1
+        try:
+            rendered = await loop.run_in_executor(self.pool, render_chunk, 0, chunk)
+        except Exception as exception:
+            future.set_exception(exception)
+            # Retrieved here as well, for when no other request shares it.
+            future.exception()
+            raise
+        else:
+            data = rendered[0].data
+            future.set_result(data)
+            self.images[key] = data
+            if len(self.images) > self.max_entries:
+                self.images.popitem(last=False)
+        finally:
+            del self.pending[key]
+            if not future.done():
+                future.cancel()
+        return data
+
+    def metrics(self) -> dict[str, int | dict[str, float]]:
+        latencies = sorted(self.latencies)
+        percentiles = (
+            statistics.quantiles(latencies, n=100, method="inclusive")
+            if len(latencies) > 1
+            else latencies * 99
+        )
+        return {
+            "requests": self.requests,
+            "renders": self.renders,
+            "coalesced": self.coalesced,
+            "hits": self.hits,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "queue_depth": len(self.pending),
+            "max_pending": self.max_pending,
+            "entries": len(self.images),
+            "latency_ms": {
+                f"p{p}": percentiles[p - 1] * 1000 if percentiles else 0.0
+                for p in (50, 90, 99)
+            },
+        }
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8000) -> None:
+        server = await asyncio.start_server(self.handle, host, port)
+        for socket in server.sockets:
+            address = socket.getsockname()
+            sys.stderr.write(f"serving on http://{address[0]}:{address[1]}\n")
+        async with server:
+            await server.serve_forever()
+
+
+def error(status: HTTPStatus, message: str | None = None) -> Response:
+    text = status.phrase if message is None else message
+    return status, "text/plain; charset=utf-8", f"{text}\n".encode()
+
+
+def serve(
+    options: Options,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    workers: int | None = None,
+    max_pending: int = 64,
+) -> None:
+    """Run a `Server` rendering PNGs with `options` on a pool of `workers`
+    processes until interrupted."""
+    options = structs.replace(
+        options, output=structs.replace(options.output, format="PNG"), raw=False
+    )
+    with ProcessPoolExecutor(
+        workers or os.cpu_count() or 1, initializer=initialize, initargs=(options,)
+    ) as pool:
+        asyncio.run(Server(pool, max_pending).serve(host, port))
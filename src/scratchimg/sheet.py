@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import msgspec
+from msgspec import Struct, field
+
+from .render import drawing, new_image
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping, Sequence
+
+    import PIL.Image
+
+    from .bounding_box import BoundingBox
+    from .context import Context
+    from .misc import Color
+    from .render import Script
+
+
+class Rect(Struct, frozen=True):
+    sheet: int
+    x: int
+    y: int
+    w: int
+    h: int
+
+
+class Skyline(Struct):
+    """Bottom-left skyline packer for one sheet. `segments` are the `(x, y, w)`
+    spans of the skyline, left to right."""
+
+    width: int
+    height: int
+    segments: list[tuple[int, int, int]] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        if not self.segments:
+            self.segments.append((0, 0, self.width))
+
+    def fit(self, index: int, w: int, h: int) -> int | None:
+        """Lowest y at which a `w` by `h` rect fits starting at segment `index`."""
+        x = self.segments[index][0]
+        if x + w > self.width:
+            return None
+        y = 0
+        remaining = w
+        for _, segment_y, segment_w in self.segments[index:]:
+            y = max(y, segment_y)
+            if y + h > self.height:
+                return None
+            remaining -= segment_w
+            if remaining <= 0:
+                return y
+        return None
+
+    def insert(self, w: int, h: int) -> tuple[int, int] | None:
+        best: tuple[int, int, int] | None = None
+        for index, (x, _, _) in enumerate(self.segments):
+            y = self.fit(index, w, h)
+            if y is not None and (best is None or (y + h, x) < (best[1] + h, best[0])):
+                best = (x, y, index)
+        if best is None:
+            return None
+        x, y, index = best
+        self.place(index, x, y + h, w)
+        return x, y
+
+    def place(self, index: int, x: int, top: int, w: int) -> None:
+        segments = self.segments[:index]
+        segments.append((x, top, w))
+        for segment_x, segment_y, segment_w in self.segments[index:]:
+            end = segment_x + segment_w
+            if end <= x + w:
+                continue
+            start = max(segment_x, x + w)
+            segments.append((start, segment_y, end - start))
+        merged: list[tuple[int, int, int]] = []
+        for segment in segments:
+            if merged and merged[-1][1] == segment[1]:
+                merged[-1] = (merged[-1][0], segment[1], merged[-1][2] + segment[2])
+            else:
+                merged.append(segment)
+        self.segments = merged
+
+
+def pack(sizes: Sequence[BoundingBox], width: int, height: int) -> list[Rect]:
+    """Pack rects of `sizes` into as few `width` by `height` sheets as the
+    skyline heuristic manages, tallest first. A rect larger than a sheet gets
+    a sheet of its own."""
+    rects: list[Rect | None] = [None] * len(sizes)
+    sheets: list[Skyline] = []
+    for i in sorted(range(len(sizes)), key=lambda i: (-sizes[i].h, -sizes[i].w)):
+        size = sizes[i]
+        if size.w > width or size.h > height:
+            sheets.append(Skyline(size.w, size.h, [(0, size.h, size.w)]))
+            rects[i] = Rect(len(sheets) - 1, 0, 0, size.w, size.h)
+            continue
+        number = 0
+        for sheet in sheets:
+            position = sheet.insert(size.w, size.h)
+            if position is not None:
+                break
+            number += 1
+        else:
+            sheets.append(Skyline(width, height))
+            position = sheets[number].insert(size.w, size.h)
+        if position is None:
+            msg = f"cannot pack a {size.w}x{size.h} rect"
+            raise ValueError(msg)
+        rects[i] = Rect(number, position[0], position[1], size.w, size.h)
+    return [rect for rect in rects if rect is not None]
+
+
+class SpriteSheets(Struct):
+    images: list[PIL.Image.Image]
+    index: dict[str, Rect]
+
+    def save(self, stem: str | Path, suffix: str = "png") -> None:
+        """Write `{stem}-{n}.{suffix}` for each sheet, in the format of the
+        suffix, and `{stem}.json`, mapping script id to `{"sheet", "x", "y", "w",
+        "h"}`."""
+        stem = Path(stem)
+        for number, image in enumerate(self.images):
+            image.save(stem.with_name(f"{stem.name}-{number}.{suffix}"))
+        stem.with_name(f"{stem.name}.json").write_bytes(msgspec.json.encode(self.index))
+
+
+def render_sheets(
+    scripts: Mapping[str, Script],
+    ctx: Context,
+    size: tuple[int, int] = (2048, 2048),
+    spacing: int = 1,
+    background: Color = None,
+) -> SpriteSheets:
+    """Render `scripts` packed into sprite sheets of at most `size`, each script
+    directly at its packed offset, with `spacing` pixels between neighbours."""
+    width, height = size
+    ids = list(scripts)
+    sizes = [scripts[i].bounding_box(ctx).addx(spacing).addy(spacing) for i in ids]
+    rects = pack(sizes, width + spacing, height + spacing)
+    extents = [(0, 0)] * (max((rect.sheet for rect in rects), default=-1) + 1)
+    for rect in rects:
+        w, h = extents[rect.sheet]
+        extents[rect.sheet] = (max(w, rect.x + rect.w), max(h, rect.y + rect.h))
+    images = [
+        new_image((w - spacing, h - spacing), background, ctx.palette)
+        for w, h in extents
+    ]
+    placed: list[list[tuple[Script, Rect]]] = [[] for _ in images]
+    index: dict[str, Rect] = {}
+    for script_id, rect in zip(ids, rects, strict=True):
+        placed[rect.sheet].append((scripts[script_id], rect))
+        index[script_id] = Rect(
+            rect.sheet, rect.x, rect.y, rect.w - spacing, rect.h - spacing
+        )
+    for image, sheet in zip(images, placed, strict=True):
+        with ctx.phase("layout"):
+            layouts = [script.layout(ctx, rect.x, rect.y) for script, rect in sheet]
+        with ctx.phase("raster"), drawing(ctx, image) as draw_ctx:
+            for (script, _), layout in zip(sheet, layouts, strict=True):
+                script.paint(draw_ctx, layout)
+    return SpriteSheets(images, index)
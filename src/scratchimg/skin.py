@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import PIL.Image
+import PIL.ImageDraw
+from msgspec import Struct, field, structs
+
+from .blocks import render_block, render_c
+
+if TYPE_CHECKING:
+    from collections.abc import Hashable, Sequence
+
+    from .context import Context
+    from .style import BlockStyle
+
+type RGB = tuple[int, int, int]
+type Run = tuple[int, int, RGB]
+type Segment = tuple[int, int, int | None]
+
+
+def segments(size: int, stretch: Sequence[int]) -> list[Segment]:
+    """Split `range(size)` into fixed spans and the one-pixel spans at `stretch`,
+    as `(start, end, index into stretch or None)`."""
+    result: list[Segment] = []
+    start = 0
+    for index, position in enumerate(stretch):
+        if position > start:
+            result.append((start, position, None))
+        result.append((position, position + 1, index))
+        start = position + 1
+    if start < size:
+        result.append((start, size, None))
+    return result
+
+
+def spans(origin: int, segments: Sequence[Segment], counts: Sequence[int]) -> list[int]:
+    """Start of each segment in the painted shape, followed by its end."""
+    result = [origin]
+    for start, end, index in segments:
+        origin += end - start if index is None else counts[index]
+        result.append(origin)
+    return result
+
+
+def runs(pixels: bytes) -> list[Run]:
+    """Runs of equal opaque pixels along a one-pixel RGBA strip."""
+    result: list[Run] = []
+    previous: RGB | None = None
+    for i in range(len(pixels) // 4):
+        r, g, b, a = pixels[i * 4 : i * 4 + 4]
+        color = (r, g, b) if a else None
+        if color is not None and color == previous:
+            result[-1] = (result[-1][0], i + 1, color)
+        elif color is not None:
+            result.append((i, i + 1, color))
+        previous = color
+    return result
+
+
+class Piece(Struct):
+    """A cell of a `Skin`.
+
+    A cell that is fixed in both directions is pasted as a tile. A cell that
+    stretches is a one-pixel strip whose runs of equal pixels are filled as
+    rectangles across the stretched direction.
+    """
+
+    column: int
+    row: int
+    tile: PIL.Image.Image | None = None
+    mask: PIL.Image.Image | None = None
+    runs: list[Run] = field(default_factory=list)
+    along_x: bool = False
+
+
+class Skin(Struct):
+    """A shape rendered once at a template size and sliced along one-pixel
+    columns and rows, which are stretched to compose the shape at other sizes."""
+
+    columns: list[Segment]
+    rows: list[Segment]
+    pieces: list[Piece]
+
+    @classmethod
+    def slice(
+        cls,
+        template: PIL.Image.Image,
+        columns: Sequence[int],
+        rows: Sequence[int],
+    ) -> Skin:
+        xs = segments(template.width, columns)
+        ys = segments(template.height, rows)
+        pieces: list[Piece] = []
+        for j, (y0, y1, row) in enumerate(ys):
+            for i, (x0, x1, column) in enumerate(xs):
+                crop = template.crop((x0, y0, x1, y1))
+                if column is None and row is None:
+                    alpha = crop.getchannel("A").getextrema()
+                    if alpha == (0, 0):
+                        continue
+                    mask = None if alpha == (255, 255) else crop
+                    pieces.append(Piece(i, j, tile=crop, mask=mask))
+                else:
+                    along_x = column is None
+                    pieces.append(
+                        Piece(i, j, runs=runs(crop.tobytes()), along_x=along_x)
+                    )
+        return cls(xs, ys, pieces)
+
+    def paint(
+        self,
+        ctx: Context,
+        xy: tuple[int, int],
+        columns: Sequence[int],
+        rows: Sequence[int],
+    ) -> None:
+        """Paint at `xy` with stretch column `i` widened to `columns[i]` pixels
+        and stretch row `j` heightened to `rows[j]` pixels."""
+        xs = spans(xy[0], self.columns, columns)
+        ys = spans(xy[1], self.rows, rows)
+        for piece in self.pieces:
+            x0, x1 = xs[piece.column], xs[piece.column + 1]
+            y0, y1 = ys[piece.row], ys[piece.row + 1]
+            if x1 <= x0 or y1 <= y0:
+                continue
+            if piece.tile is not None:
+                ctx.paste(piece.tile, (x0, y0), piece.mask)
+            elif piece.along_x:
+                for start, end, color in piece.runs:
+                    ctx.fill((x0 + start, y0, x0 + end, y1), color)
+            elif self.rows[piece.row][2] is None:
+                for start, end, color in piece.runs:
+                    ctx.fill((x0, y0 + start, x1, y0 + end), color)
+            else:
+                for _, _, color in piece.runs:
+                    ctx.fill((x0, y0, x1, y1), color)
+
+
+class Skins(Struct):
+    """Nine-slice skins of `Block` and `C` shapes per `BlockStyle` and `Style`.
+
+    Each skin is cut from a template drawn by `render_block` or `render_c`, which
+    remain the reference backend and are still used for shapes smaller than the
+    template. Output is pixel-identical to the reference backend.
+    """
+
+    skins: dict[Hashable, Skin] = field(default_factory=dict)
+
+    def template(self, ctx: Context, size: tuple[int, int]) -> Context:
+        tile = PIL.Image.new("RGBA", size)
+        return structs.replace(
+            ctx,
+            draw=PIL.ImageDraw.Draw(tile),
+            canvas=None,
+            skins=None,
+            viewport=None,
+            palette=None,
+        )
+
+    def block(
+        self,
+        ctx: Context,
+        box: tuple[int, int, int, int],
+        style: BlockStyle,
+        is_last: bool,
+    ) -> None:
+        s = ctx.style
+        left = s.block_roundness + s.tab_padding + 2 * s.tab_height + s.tab_width + 2
+        right = s.block_roundness + 2
+        top = max(s.block_roundness, s.tab_height + 1) + 2
+        bottom = s.block_roundness + 2
+        x0, y0, x1, y1 = box
+        columns = [x1 - x0 + 1 - left - right]
+        rows = [y1 - y0 + 1 - top - bottom]
+        if min(*columns, *rows) < 0:
+            render_block(ctx, box, style, is_last)
+            return
+        key = ("block", structs.astuple(style), structs.astuple(s), is_last)
+        skin = self.skins.get(key)
+        if ctx.stats is not None:
+            ctx.stats.count("skins.miss" if skin is None else "skins.hit")
+        if skin is None:
+            width = left + 1 + right
+            height = top + 1 + bottom
+            template = self.template(ctx, (width, height + s.tab_height))
+            render_block(template, (0, 0, width - 1, height - 1), style, is_last)
+            skin = Skin.slice(template.image, [left], [top])
+            self.skins[key] = skin
+        skin.paint(ctx, (x0, y0), columns, rows)
+
+    def c(  # noqa: PLR0913, PLR0917 - the arguments of render_c
+        self,
+        ctx: Context,
+        style: BlockStyle,
+        x0: int,
+        y0: int,
+        x1: int,
+        y1: int,
+        height: int,
+        is_stack_last: bool,
+        is_last: bool,
+    ) -> None:
+        s = ctx.style
+        tab = s.tab_padding + 2 * s.tab_height + s.tab_width
+        left = s.c_width + s.c_roundness + tab + 2
+        right = s.c_roundness + 2
+        top = max(s.c_roundness, s.tab_height + 1) + 2
+        bottom = s.c_roundness + 2
+        mouth_top = max(s.c_roundness, s.tab_height) + 2
+        mouth_bottom = s.c_roundness + 2
+        columns = [x1 - x0 + 1 - left - right]
+        rows = [y1 - y0 + 1 - top - bottom, height - mouth_top - mouth_bottom]
+        if min(*columns, *rows) < 0:
+            render_c(ctx, style, x0, y0, x1, y1, height, is_stack_last, is_last)
+            return
+        key = (
+            "c",
+            structs.astuple(style),
+            structs.astuple(s),
+            is_stack_last,
+            is_last,
+        )
+        skin = self.skins.get(key)
+        if ctx.stats is not None:
+            ctx.stats.count("skins.miss" if skin is None else "skins.hit")
+        if skin is None:
+            width = left + 1 + right
+            arm = top + 1 + bottom
+            mouth = mouth_top + 1 + mouth_bottom
+            template = self.template(
+                ctx, (width, arm + mouth + s.c_width + s.tab_height + 1)
+            )
+            render_c(
+                template,
+                style,
+                0,
+                0,
+                width - 1,
+                arm - 1,
+                mouth,
+                is_stack_last=is_stack_last,
+                is_last=is_last,
+            )
+            skin = Skin.slice(template.image, [left], [top, arm + mouth_top])
+            self.skins[key] = skin
+        skin.paint(ctx, (x0, y0), columns, rows)
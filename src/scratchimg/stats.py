@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import heapq
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import msgspec
+from msgspec import Struct, field
+
+from .arena import children
+from .index import label
+
+if TYPE_CHECKING:
+    from collections.abc import Generator
+
+    from .blocks import Node
+    from .render import Script
+
+
+def paths(script: Script) -> dict[int, list[int]]:
+    """The child indices from `script` to each of its nodes, by `id`."""
+    found: dict[int, list[int]] = {id(script): []}
+    pending: list[tuple[Node, list[int]]] = [(script, [])]
+    while pending:
+        node, path = pending.pop()
+        for i, child in enumerate(children(node)):
+            found[id(child)] = [*path, i]
+            pending.append((child, [*path, i]))
+    return found
+
+
+class Stats(Struct):
+    """Counters and timings of the renders of a `Context` that carries it.
+
+    `counts` has the calls to `text_bounding_box` and to each drawing method of
+    the `Context`, and the hits and misses of its leaf, skin and glyph caches.
+    `phases` has the total seconds spent laying out, rasterizing and encoding.
+    The `keep` slowest subtrees are remembered: every node laid out below the
+    root, and every block of a `Stack` painted. Each phase and subtree is also
+    an event of the Chrome trace written by `write_trace`, which has the last
+    `max_events` of them.
+    """
+
+    keep: int = 10
+    max_events: int = 100_000
+    counts: dict[str, int] = field(default_factory=dict)
+    phases: dict[str, float] = field(default_factory=dict)
+    events: deque[tuple[str, str, int, int]] = field(default_factory=deque)
+    slowest: list[tuple[int, int, str, Node]] = field(default_factory=list)
+    subtrees: int = 0
+    origin: int = field(default_factory=time.perf_counter_ns)
+
+    def __post_init__(self) -> None:
+        self.events = deque(self.events, maxlen=self.max_events)
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    @contextmanager
+    def phase(self, name: str) -> Generator[None]:
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            self.phases[name] = self.phases.get(name, 0) + elapsed / 1e9
+            self.events.append((name, "phase", start, elapsed))
+
+    def subtree(self, phase: str, node: Node, start: int) -> None:
+        """Record that `phase` of `node` ran from `start`, a
+        `time.perf_counter_ns`, until now."""
+        elapsed = time.perf_counter_ns() - start
+        self.events.append((type(node).__name__, phase, start, elapsed))
+        self.subtrees += 1
+        entry = (elapsed, self.subtrees, phase, node)
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, entry)
+        else:
+            heapq.heappushpop(self.slowest, entry)
+
+    def to_dict(self, script: Script | None = None) -> dict[str, object]:
+        """The counts, phases and slowest subtrees, JSON-ready. Subtrees have
+        the `path` of child indices to them from `script`, if given and found
+        there."""
+        found = {} if script is None else paths(script)
+        return {
+            "counts": dict(self.counts),
+            "phases": dict(self.phases),
+            "slowest": [
+                {
+                    "phase": phase,
+                    "seconds": elapsed / 1e9,
+                    "kind": type(node).__name__,
+                    "text": label(node),
+                    "path": found.get(id(node)),
+                }
+                for elapsed, _, phase, node in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+    def trace(self) -> dict[str, object]:
+        """The events in the Chrome trace event format, in microseconds since
+        the collector was created."""
+        pid = os.getpid()
+        return {
+            "traceEvents": [
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": (start - self.origin) / 1e3,
+                    "dur": elapsed / 1e3,
+                    "pid": pid,
+                    "tid": 0,
+                }
+                for name, category, start, elapsed in self.events
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def write_trace(self, path: str | Path) -> None:
+        """Save `trace` as JSON for `chrome://tracing` or Perfetto."""
+        Path(path).write_bytes(msgspec.json.encode(self.trace()))
+
+    def clear(self) -> None:
+        self.counts.clear()
+        self.phases.clear()
+        self.events.clear()
+        self.slowest.clear()
+        self.subtrees = 0
@@ -1,11 +1,8 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
-
 from msgspec import Struct
 
-if TYPE_CHECKING:
-    from .misc import Color
+from .misc import Color  # noqa: TC001 - msgspec decodes fields at runtime
 
 
 class Style(Struct):
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+from html import escape
+from typing import TYPE_CHECKING, Protocol
+
+from msgspec import Struct, field, structs
+
+from .render import Output
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Hashable, Sequence
+
+    import PIL.Image
+
+    from .context import Context
+    from .font import GlyphAtlas
+    from .misc import Color
+    from .render import Script
+
+type Vert = tuple[int, int]
+
+
+class Writable(Protocol):
+    def write(self, text: str, /) -> object: ...
+
+
+def css(value: Color) -> str:
+    if value is None:
+        return "none"
+    if isinstance(value, str):
+        return escape(value)
+    return "#{:02x}{:02x}{:02x}".format(*value)
+
+
+def path(verts: Sequence[Vert], closed: bool) -> str:
+    """Path data for `verts` relative to the first, which is at the origin."""
+    x0, y0 = verts[0]
+    d = "M0 0" + "".join(f"L{x - x0} {y - y0}" for x, y in verts[1:])
+    return d + "Z" if closed else d
+
+
+def pixels(mask: PIL.Image.Image) -> str:
+    """Path data covering the non-zero pixels of `mask`, one rectangle per run."""
+    width, height = mask.size
+    data = mask.tobytes()
+    d: list[str] = []
+    for y in range(height):
+        row = data[y * width : (y + 1) * width]
+        x = 0
+        while x < width:
+            if row[x]:
+                start = x
+                while x < width and row[x]:
+                    x += 1
+                d.append(f"M{start} {y}h{x - start}v1h{start - x}z")
+            x += 1
+    return "".join(d)
+
+
+class SvgWriter(Struct):
+    """Writes the drawing of a `Context` to `out` as SVG, one element per shape
+    as the script is painted, so nothing is kept per block.
+
+    Each distinct shape, polyline and word is emitted once in a `<defs>` at its
+    first use and referenced with `<use>` after, colored by the `<use>`, for up
+    to `max_defs` of them. Text is drawn from a `<symbol>` per glyph of `atlas`,
+    pixel for pixel, or as `<text>` in `font_family` without one. Shapes are
+    offset by half a pixel so one-pixel strokes land on pixel centers as they do
+    in the raster output.
+    """
+
+    out: Writable
+    atlas: GlyphAtlas | None = None
+    font_family: str = "monospace"
+    max_defs: int = 65536
+    defs: dict[Hashable, str] = field(default_factory=dict)
+
+    def define(self, key: Hashable, element: Callable[[str], str]) -> str | None:
+        """The name of the definition of `key`, writing `element(name)` in a
+        `<defs>` first if it is new; `None` once `max_defs` are in use."""
+        name = self.defs.get(key)
+        if name is None:
+            if len(self.defs) >= self.max_defs:
+                return None
+            name = self.defs[key] = f"d{len(self.defs)}"
+            self.out.write(f"<defs>{element(name)}</defs>\n")
+        return name
+
+    def shape(self, verts: Sequence[Vert], closed: bool, paint: str) -> None:
+        d = path(verts, closed)
+        fill = "" if closed else ' fill="none"'
+        x, y = verts[0]
+        name = self.define(
+            (closed, d),
+            lambda name: f'<path id="{name}" d="{d}"{fill} stroke-linecap="square"/>',
+        )
+        if name is None:
+            self.out.write(
+                f'<path transform="translate({x + 0.5} {y + 0.5})" d="{d}"{fill}'
+                f' stroke-linecap="square"{paint}/>\n'
+            )
+        else:
+            self.out.write(
+                f'<use href="#{name}" x="{x + 0.5}" y="{y + 0.5}"{paint}/>\n'
+            )
+
+    def polygon(self, verts: Sequence[Vert], fill: Color, outline: Color) -> None:
+        if fill is None and outline is None:
+            return
+        stroke = "" if outline is None else f' stroke="{css(outline)}"'
+        self.shape(verts, True, f' fill="{css(fill)}"{stroke}')
+
+    def outline(self, color: Color, verts: Sequence[Vert]) -> None:
+        if color is not None and len(verts) > 1:
+            self.shape(verts, False, f' stroke="{css(color)}"')
+
+    def fill(self, box: tuple[int, int, int, int], color: Color) -> None:
+        if color is not None:
+            x0, y0, x1, y1 = box
+            self.out.write(
+                f'<rect x="{x0}" y="{y0}" width="{x1 - x0}" height="{y1 - y0}"'
+                f' fill="{css(color)}"/>\n'
+            )
+
+    def text(self, xy: Vert, text: str, fill: Color) -> None:
+        if fill is None or text == "":
+            return
+        x, y = xy
+        if self.atlas is None:
+            self.out.write(
+                f'<text x="{x}" y="{y}" dominant-baseline="text-before-edge"'
+                f' font-family="{escape(self.font_family)}" fill="{css(fill)}"'
+                f' xml:space="preserve">{escape(text)}</text>\n'
+            )
+            return
+        name = self.define(("text", text), lambda name: self.word(name, text))
+        if name is None:
+            self.out.write(
+                f'<g transform="translate({x} {y})" fill="{css(fill)}">'
+                f"{self.glyphs(text)}</g>\n"
+            )
+        else:
+            self.out.write(
+                f'<use href="#{name}" x="{x}" y="{y}" fill="{css(fill)}"/>\n'
+            )
+
+    def word(self, name: str, text: str) -> str:
+        return f'<symbol id="{name}" overflow="visible">{self.glyphs(text)}</symbol>'
+
+    def glyphs(self, text: str) -> str:
+        """`<use>` of the glyph `<symbol>` of each character, defining any that
+        are new."""
+        if self.atlas is None:
+            return ""
+        metrics = self.atlas.metrics
+        uses: list[str] = []
+        x = 0
+        for char in text.encode("latin-1").partition(b"\0")[0]:
+            glyph = self.atlas.glyphs[char]
+            if glyph is not None:
+                dx, dy = metrics.glyphs[char][:2]
+                name = self.define(
+                    ("glyph", metrics.path, char),
+                    lambda name, glyph=glyph: (
+                        f'<symbol id="{name}" overflow="visible">'
+                        f'<path d="{pixels(glyph)}"/></symbol>'
+                    ),
+                )
+                uses.append(
+                    f'<use href="#{name}" x="{x + dx}" y="{metrics.baseline + dy}"/>'
+                    if name is not None
+                    else f'<path transform="translate({x + dx} {metrics.baseline + dy})"'
+                    f' d="{pixels(glyph)}"/>'
+                )
+            x += metrics.advances[char]
+        return "".join(uses)
+
+
+def write_svg(
+    script: Script,
+    ctx: Context,
+    out: Writable,
+    output: Output | None = None,
+    glyphs: bool = True,
+) -> None:
+    """Lay out `script` like `render_to_image` and write it to `out` as SVG,
+    with the padding and background of `output` and its size times its `scale`;
+    its `format` does not apply.
+
+    Text is drawn with the glyphs of `ctx.atlas` unless `glyphs` is false or
+    there is no atlas, when it is written as `<text>` instead.
+    """
+    output = Output() if output is None else output
+    layout = script.layout(ctx, output.padding, output.padding)
+    size = layout.bounding_box.outset(output.padding)
+    out.write(
+        f'<svg xmlns="http://www.w3.org/2000/svg"'
+        f' width="{size.w * output.scale}" height="{size.h * output.scale}"'
+        f' viewBox="0 0 {size.w} {size.h}" shape-rendering="crispEdges">\n'
+    )
+    if output.background is not None:
+        out.write(
+            f'<rect width="100%" height="100%" fill="{css(output.background)}"/>\n'
+        )
+    writer = SvgWriter(out, ctx.atlas if glyphs else None)
+    script.paint(
+        structs.replace(
+            ctx, draw=None, leaves=None, skins=None, canvas=None, recorder=writer
+        ),
+        layout,
+    )
+    out.write("</svg>\n")
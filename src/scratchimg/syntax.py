@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import re
+from functools import cache
+from typing import TYPE_CHECKING
+
+from lark import Lark, Token, Transformer
+from lark.exceptions import LarkError
+from msgspec import Struct
+
+from . import styles
+from .blocks import Block, Boolean, BoxItem, C, Literal, Menu, Reporter, Stack
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from .style import BlockStyle
+
+GRAMMAR = r"""
+    line: _item* hint?
+    _item: word | round | square | boolean
+    word: WORD | OPERATOR
+    round: "(" _item* hint? ")"
+    square: SQUARE
+    boolean: OPEN_ANGLE _item* hint? CLOSE_ANGLE
+    hint: HINT
+
+    HINT.2: /::[ \t]*[a-z]+/
+    WORD: /[^\s()\[\]<>]+/
+    OPERATOR: /(?<=\s)[<>](?=\s)/
+    OPEN_ANGLE: /<(?=\S)/
+    CLOSE_ANGLE: /(?<=\S)>/
+    SQUARE: /\[[^\]\n]*\]/
+
+    %ignore /[ \t]+/
+"""
+
+NUMBER = re.compile(r"-?(\d+\.?\d*|\.\d+)")
+
+# Category of a block or reporter by its leading words, longest match first.
+CATEGORIES = {
+    "move": "motion",
+    "turn": "motion",
+    "go to": "motion",
+    "glide": "motion",
+    "point in": "motion",
+    "point towards": "motion",
+    "change x": "motion",
+    "set x": "motion",
+    "change y": "motion",
+    "set y": "motion",
+    "if on edge": "motion",
+    "set rotation": "motion",
+    "x position": "motion",
+    "y position": "motion",
+    "direction": "motion",
+    "say": "looks",
+    "think": "looks",
+    "switch": "looks",
+    "next": "looks",
+    "change size": "looks",
+    "set size": "looks",
+    "clear graphic": "looks",
+    "show": "looks",
+    "hide": "looks",
+    "go to front": "looks",
+    "go": "looks",
+    "costume": "looks",
+    "backdrop": "looks",
+    "size": "looks",
+    "play": "sound",
+    "start sound": "sound",
+    "stop all sounds": "sound",
+    "clear sound": "sound",
+    "change volume": "sound",
+    "set volume": "sound",
+    "change pitch": "sound",
+    "set pitch": "sound",
+    "volume": "sound",
+    "when": "events",
+    "broadcast": "events",
+    "wait": "control",
+    "repeat": "control",
+    "forever": "control",
+    "if": "control",
+    "stop": "control",
+    "create clone": "control",
+    "delete this clone": "control",
+    "ask": "sensing",
+    "reset timer": "sensing",
+    "set drag": "sensing",
+    "touching": "sensing",
+    "key": "sensing",
+    "mouse": "sensing",
+    "color": "sensing",
+    "distance": "sensing",
+    "answer": "sensing",
+    "timer": "sensing",
+    "loudness": "sensing",
+    "current": "sensing",
+    "days since": "sensing",
+    "username": "sensing",
+    "join": "operators",
+    "letter": "operators",
+    "length of": "operators",
+    "pick random": "operators",
+    "round": "operators",
+    "set": "variables",
+    "change": "variables",
+    "show variable": "variables",
+    "hide variable": "variables",
+    "add": "lists",
+    "delete": "lists",
+    "insert": "lists",
+    "replace": "lists",
+    "show list": "lists",
+    "hide list": "lists",
+    "item": "lists",
+}
+
+# Leading words of blocks that open a C block: `forever` always, the others
+# only when they take an input, so that `if on edge, bounce` stays a block.
+C_BLOCKS = {"if", "repeat", "while", "for"}
+# Blocks nothing can follow, by all of their leading words, and the options of
+# `stop [ v]` that make it one.
+CAP_BLOCKS = {"forever", "stop all", "stop this script", "delete this clone"}
+STOP_OPTIONS = {"all", "this script"}
+# Punctuation that ends a word without being part of it, as in `if on edge,`.
+PUNCTUATION = ",.;:!?"
+
+
+class Hint(Struct, frozen=True):
+    category: str
+
+
+def leading_words(items: list[BoxItem]) -> list[str]:
+    words: list[str] = []
+    for item in items:
+        if not isinstance(item, str):
+            break
+        words.extend(filter(None, (word.strip(PUNCTUATION) for word in item.split())))
+    return words
+
+
+def starts_with(words: list[str], phrases: set[str]) -> bool:
+    return any(" ".join(words[:count]) in phrases for count in range(1, 4))
+
+
+def is_cap(items: list[BoxItem]) -> bool:
+    match items:
+        case ["stop", Menu(value=value)]:
+            return value in STOP_OPTIONS
+        case _:
+            return " ".join(leading_words(items)) in CAP_BLOCKS
+
+
+def category(items: list[BoxItem], hint: Hint | None, default: str) -> BlockStyle:
+    if hint is not None:
+        if hint.category not in styles:
+            msg = f"unknown category {hint.category!r}"
+            raise SyntaxError(msg)
+        return styles[hint.category]
+    words = leading_words(items)
+    for count in range(min(len(words), 3), 0, -1):
+        key = " ".join(words[:count])
+        if key in CATEGORIES:
+            return styles[CATEGORIES[key]]
+    return styles[default]
+
+
+type Items = tuple[list[BoxItem], Hint | None]
+
+
+class Line(Transformer[Token, Items]):
+    """Turn the parse tree of one line into its items and category hint."""
+
+    def split(self, children: list[BoxItem | Hint]) -> Items:
+        hint = children[-1] if children else None
+        if isinstance(hint, Hint):
+            children = children[:-1]
+        else:
+            hint = None
+        return merge([child for child in children if not isinstance(child, Hint)]), hint
+
+    def line(self, children: list[BoxItem | Hint]) -> Items:
+        return self.split(children)
+
+    def word(self, children: list[Token]) -> str:
+        return str(children[0])
+
+    def hint(self, children: list[Token]) -> Hint:
+        return Hint(children[0].lstrip(":").strip())
+
+    def square(self, children: list[Token]) -> Literal | Menu:
+        value = children[0][1:-1]
+        if value.endswith(" v"):
+            return Menu(value[:-2])
+        return Literal(value)
+
+    def round(self, children: list[BoxItem | Hint]) -> Literal | Menu | Reporter:
+        items, hint = self.split(children)
+        if not items:
+            return Literal("")
+        if len(items) == 1 and isinstance(items[0], str):
+            words = items[0].split()
+            if len(words) == 1 and NUMBER.fullmatch(words[0]):
+                return Literal(words[0])
+            if len(words) > 1 and words[-1] == "v" and hint is None:
+                return Menu(" ".join(words[:-1]))
+        return Reporter(category(items, hint, "variables"), items)
+
+    def boolean(self, children: list[BoxItem | Hint | Token]) -> Boolean:
+        items, hint = self.split(children[1:-1])
+        return Boolean(category(items, hint, "operators"), items)
+
+
+def merge(items: list[BoxItem]) -> list[BoxItem]:
+    """Join runs of words into single labels, as hand-built scripts have them."""
+    merged: list[BoxItem] = []
+    for item in items:
+        if isinstance(item, str) and merged and isinstance(merged[-1], str):
+            merged[-1] = f"{merged[-1]} {item}"
+        else:
+            merged.append(item)
+    return merged
+
+
+@cache
+def parser() -> Lark:
+    """The line parser, built on first use from the LALR tables lark caches on
+    disk, so importing `scratchimg` never compiles the grammar."""
+    return Lark(GRAMMAR, start="line", parser="lalr", cache=True)
+
+
+def parse_line(line: str, lineno: int = 1) -> Items:
+    try:
+        return Line().transform(parser().parse(line))
+    except LarkError as error:
+        msg = f"cannot parse line {lineno}: {line.strip()!r}"
+        raise SyntaxError(msg, (None, lineno, None, line)) from error
+
+
+def parse_scripts(lines: Iterable[str]) -> Iterator[Stack]:
+    """Parse scratchblocks-style text into one `Stack` per script.
+
+    Scripts are separated by blank lines and each is yielded as soon as it ends,
+    so a document of any length is parsed one script at a time. C blocks
+    (`if <> then`, `repeat ()`, `forever`, ...) end at a line that says `end`. A
+    trailing `:: category` sets the category of a block, reporter or boolean.
+    """
+    script: list[Block | C] = []
+    heads: list[tuple[Block, list[Block | C]]] = []
+    lineno = 0
+    for lineno, line in enumerate(lines, 1):
+        text = line.strip()
+        if text == "":
+            if not heads and script:
+                yield Stack(script)
+                script = []
+            continue
+        if text == "end":
+            if not heads:
+                msg = f"line {lineno}: `end` without a C block"
+                raise SyntaxError(msg)
+            head, items = heads.pop()
+            (heads[-1][1] if heads else script).append(
+                C(head.style, head.items, Stack(items), is_last=head.is_last)
+            )
+            continue
+        if text.split()[0] == "else":
+            msg = f"line {lineno}: if-else blocks are not supported"
+            raise SyntaxError(msg)
+        items, hint = parse_line(text, lineno)
+        words = leading_words(items)
+        block = Block(
+            category(items, hint, "custom"),
+            items,
+            is_last=is_cap(items),
+        )
+        if words[:1] == ["forever"] or (
+            starts_with(words, C_BLOCKS)
+            and any(not isinstance(item, str) for item in items)
+        ):
+            heads.append((block, []))
+        else:
+            (heads[-1][1] if heads else script).append(block)
+    if heads:
+        msg = f"line {lineno}: C block without `end`"
+        raise SyntaxError(msg)
+    if script:
+        yield Stack(script)
+
+
+def parse(text: str) -> Stack:
+    """Parse a single script; blank lines are ignored."""
+    for script in parse_scripts(line for line in text.splitlines() if line.strip()):
+        return script
+    return Stack([])
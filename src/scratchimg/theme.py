@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from msgspec import Struct, structs
+
+from . import styles
+from .arena import Arena
+from .palette import Palette, rgb
+from .render import render_to_image
+from .style import BlockStyle, Style
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    import PIL.Image
+
+    from .context import Context
+    from .misc import Color
+    from .palette import RGB
+    from .render import Script
+
+ROLES = tuple(BlockStyle.__struct_fields__)
+
+type Slot = tuple[str, str]
+
+
+class Themed(Struct):
+    """A script rasterized once into a "P" `image` whose palette has a slot per
+    `(category, role)`, where a role is a field of `BlockStyle`.
+
+    Literals are the category `"literal"` with the roles `"background"` and
+    `"foreground"`, and a background colour is `("image", "background")`.
+    `retheme` changes the colours of the slots in place, in O(slots).
+    """
+
+    image: PIL.Image.Image
+    slots: list[Slot]
+    colors: list[RGB]
+
+    def palette(
+        self,
+        theme: Mapping[str, BlockStyle],
+        style: Style | None = None,
+        background: Color = None,
+    ) -> list[RGB]:
+        """The colour of each slot in `theme`, in `style` for literals and
+        `background` for the image. Slots they leave out keep the colours the
+        image was rendered with."""
+        colors = list(self.colors)
+        for i, (category, role) in enumerate(self.slots):
+            if category == "literal":
+                color = None if style is None else getattr(style, f"literal_{role}")
+            elif category == "image":
+                color = background
+            else:
+                block_style = theme.get(category)
+                color = None if block_style is None else getattr(block_style, role)
+            if color is not None:
+                colors[i] = rgb(color)
+        return colors
+
+    def retheme(
+        self,
+        theme: Mapping[str, BlockStyle],
+        style: Style | None = None,
+        background: Color = None,
+    ) -> PIL.Image.Image:
+        """Recolour `image` with `palette(theme, style, background)` and return
+        it; copy it first to keep the previous theme."""
+        colors = self.palette(theme, style, background)
+        self.image.putpalette([0, 0, 0, *(c for color in colors for c in color)])
+        return self.image
+
+
+def render_themed(
+    script: Script,
+    ctx: Context,
+    padding: int = 0,
+    background: Color = None,
+    categories: Mapping[str, BlockStyle] = styles,
+) -> Themed:
+    """Render `script` like `render_to_image` into a `Themed` image.
+
+    The category of each `BlockStyle` of `script` is its name in `categories`;
+    others are named `"style1"`, `"style2"` and so on. Each slot is drawn in a
+    colour of its own, so slots are kept apart even where their colours are
+    equal, and the image palette is then set to the actual colours.
+    """
+    arena = Arena()
+    arena.add(script)
+    names = {structs.astuple(style): name for name, style in categories.items()}
+    slots: list[Slot] = []
+    colors: list[RGB] = []
+
+    def slot(category: str, role: str, color: Color) -> Color:
+        if color is None:
+            return None
+        slots.append((category, role))
+        colors.append(rgb(color))
+        return (len(slots), 0, 0)
+
+    unnamed = 0
+    for i, style in enumerate(arena.styles):
+        name = names.get(structs.astuple(style))
+        if name is None:
+            unnamed += 1
+            name = f"style{unnamed}"
+        arena.styles[i] = BlockStyle(
+            *(slot(name, role, getattr(style, role)) for role in ROLES)
+        )
+    slot_style = structs.replace(
+        ctx.style,
+        literal_background=slot("literal", "background", ctx.style.literal_background),
+        literal_foreground=slot("literal", "foreground", ctx.style.literal_foreground),
+    )
+    slot_background = slot("image", "background", background)
+    palette = Palette()
+    for i in range(1, len(slots) + 1):
+        palette.add((i, 0, 0))
+    image = render_to_image(
+        arena.script(0),
+        structs.replace(ctx, style=slot_style, palette=palette),
+        padding,
+        slot_background,
+    )
+    themed = Themed(image, slots, colors)
+    themed.retheme({})
+    return themed
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from msgspec import structs
+
+from .render import Output, encode, new_image, paint_into
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    import PIL.Image
+
+    from .context import Context
+    from .layout import Layout
+    from .misc import Color
+    from .render import Script
+
+type Box = tuple[int, int, int, int]
+
+
+def render_region(
+    script: Script,
+    layout: Layout,
+    ctx: Context,
+    box: Box,
+    background: Color = None,
+) -> PIL.Image.Image:
+    """Render the part of a laid-out `script` inside `box`, exclusive of its
+    right and bottom edges, into an image of just that size.
+
+    Only the blocks of each `Stack` that overlap `box` are painted, found by
+    bisection, so the cost follows the size of the region rather than of the
+    script.
+    """
+    x0, y0, x1, y1 = box
+    image = new_image((x1 - x0, y1 - y0), background, ctx.palette)
+    paint_into(script, layout, structs.replace(ctx, viewport=box), image)
+    return image
+
+
+def render_tiles(
+    script: Script,
+    ctx: Context,
+    size: int = 1024,
+    padding: int = 0,
+    background: Color = None,
+) -> Iterator[tuple[Box, PIL.Image.Image]]:
+    """Lay out `script` like `render_to_image` and yield it as `size` by `size`
+    tiles, row by row, each with its box in the whole image. Tiles on the right
+    and bottom edges are cut to the image; only one tile is in memory at a
+    time."""
+    layout = script.layout(ctx, padding, padding)
+    full = layout.bounding_box.outset(padding)
+    for y in range(0, full.h, size):
+        for x in range(0, full.w, size):
+            box = (x, y, min(x + size, full.w), min(y + size, full.h))
+            yield box, render_region(script, layout, ctx, box, background)
+
+
+def write_tiles(
+    script: Script,
+    ctx: Context,
+    directory: str | Path,
+    size: int = 1024,
+    output: Output | None = None,
+) -> list[Path]:
+    """Save the tiles of `render_tiles`, with the padding and background of
+    `output`, to `directory` as `{row}_{column}.{format}` as each is rendered,
+    encoded as `output` says."""
+    output = Output() if output is None else output
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths: list[Path] = []
+    tiles = render_tiles(script, ctx, size, output.padding, output.background)
+    for (x, y, _, _), tile in tiles:
+        path = directory / f"{y // size}_{x // size}.{output.format.lower()}"
+        path.write_bytes(encode(tile, output))
+        paths.append(path)
+    return paths
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import random
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import PIL.ImageChops
+import pytest
+
+from scratchimg import styles
+from scratchimg.blocks import Block, C, Literal, Stack
+from scratchimg.context import Context
+from scratchimg.live import Document, children, labels
+from scratchimg.render import render_to_image
+
+if TYPE_CHECKING:
+    from scratchimg.blocks import BoxItem, Node
+    from scratchimg.misc import Color
+
+FONT = Path(__file__).parents[1] / "fonts" / "cherry-10-r.pil"
+WORDS = ["move", "say", "turn", "set", "to", "wait", "go"]
+CATEGORIES = ["motion", "looks", "sound", "events", "sensing", "variables"]
+
+
+def word(rng: random.Random) -> str:
+    """A label built at runtime, so edits free strings and make new ones whose
+    `id` may be that of a freed one."""
+    return rng.choice(WORDS) + "s" * rng.randrange(3)
+
+
+def block(rng: random.Random) -> Block:
+    items: list[BoxItem] = [word(rng)]
+    for _ in range(rng.randrange(3)):
+        items += [Literal(str(rng.randrange(10 ** rng.randrange(1, 5)))), word(rng)]
+    return Block(styles[rng.choice(CATEGORIES)], items)
+
+
+def nodes(node: Node) -> list[Node]:
+    found: list[Node] = [node, *labels(node)]
+    for child in children(node):
+        found += nodes(child)
+    return found
+
+
+def edit(rng: random.Random, document: Document) -> None:
+    found = [node for node in nodes(document.script) if not isinstance(node, str)]
+    stack = rng.choice([node for node in found if isinstance(node, Stack)])
+    literals = [node for node in found if isinstance(node, Literal)]
+    blocks = [node for node in found if isinstance(node, Block)]
+    choice = rng.randrange(5)
+    if choice == 0 and literals:
+        literal = rng.choice(literals)
+        document.edit(literal, value=str(rng.randrange(10 ** rng.randrange(1, 6))))
+    elif choice == 1 and blocks:
+        document.edit(rng.choice(blocks), items=block(rng).items)
+    elif choice == 2:
+        items = list(stack.items)
+        items.insert(rng.randrange(len(items) + 1), block(rng))
+        document.edit(stack, items=items)
+    elif choice == 3 and len(stack.items) > 1:
+        items = list(stack.items)
+        del items[rng.randrange(len(items))]
+        document.edit(stack, items=items)
+    elif blocks:
+        document.edit(rng.choice(blocks), style=styles[rng.choice(CATEGORIES)])
+
+
+@pytest.mark.parametrize("background", [None, (211, 211, 211)])
+def test_edits_match_full_render(background: Color) -> None:
+    ctx = Context.load(FONT)
+    rng = random.Random(0)
+    script = Stack(
+        [
+            *(block(rng) for _ in range(6)),
+            C(
+                styles["control"],
+                ["repeat", Literal("10")],
+                Stack([block(rng) for _ in range(4)]),
+            ),
+            *(block(rng) for _ in range(6)),
+        ]
+    )
+    document = Document.open(script, ctx, 10, background)
+    for _ in range(300):
+        edit(rng, document)
+        document.update()
+        expected = render_to_image(script, ctx, 10, background)
+        assert document.image.size == expected.size
+        assert PIL.ImageChops.difference(document.image, expected).getbbox() is None
+        live = {id(node) for node in nodes(script)}
+        assert document.sizes.keys() <= live
+        assert document.parents.keys() <= live
+        assert document.ctx.layouts is not None
+        assert document.ctx.layouts.keys() <= live